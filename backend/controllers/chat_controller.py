@@ -1,19 +1,34 @@
-from fastapi import HTTPException , Query  , Depends
-from sqlalchemy.orm import Session
+from fastapi import HTTPException , Query  , Depends , Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from schemas.chat_schema import ChatRequest
 from services.chat_service import ChatService
+from services.llm_scheduler import QueueFull
 from typing import Optional
-from database import get_db
+from database import get_async_db
 
 class ChatController:
     @staticmethod
-    async def process_stream(data: ChatRequest):
+    async def process_stream(data: ChatRequest, request: Request):
         try:
-            return await ChatService.generate_stream(data.message, data.thread_id)
+            return await ChatService.generate_stream(data.message, data.thread_id, data.file_ids, request)
+        except QueueFull as e:
+            raise HTTPException(
+                status_code=429,
+                detail="The assistant is busy, please try again shortly.",
+                headers={"Retry-After": str(e.retry_after)},
+            )
         except Exception as e:
             print("Error:", str(e))
             raise HTTPException(status_code=500, detail=str(e))
 
+    @staticmethod
+    async def resume_stream(request: Request, stream_id: str, last_event_id: Optional[str]):
+        after = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+        response = await ChatService.resume_stream(stream_id, after, request)
+        if response is None:
+            raise HTTPException(status_code=404, detail="Stream not found or expired")
+        return response
+
     @staticmethod
     async def fetch_chat_history(thread_id: str, limit: Optional[int] = Query(50, gt=0), offset: Optional[int] = Query(0, ge=0)):
        
@@ -24,9 +39,12 @@ class ChatController:
             raise HTTPException(status_code=500, detail=str(e))
     
     @staticmethod
-    def fetch_threads(db: Session = Depends(get_db)):
+    async def fetch_threads(db: AsyncSession = Depends(get_async_db)):
         try:
-            return ChatService.get_all_threads(db)
+            return await ChatService.get_all_threads(db)
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
-    
\ No newline at end of file
+
+    @staticmethod
+    def fetch_stats():
+        return ChatService.get_stats()
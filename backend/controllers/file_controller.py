@@ -1,12 +1,14 @@
-from fastapi import HTTPException, UploadFile, BackgroundTasks
+from fastapi import HTTPException, UploadFile
+from typing import Optional
 from services.file_service import FileService
-from services.vector_service import VectorService
+from services.ingestion_jobs import IngestionJobService, IngestionQueueFull
+from services.index_store import IndexStore
 
 
 class FileController:
 
     @staticmethod
-    def upload(file: UploadFile, background_tasks: BackgroundTasks):
+    def upload(file: UploadFile):
         if not file:
             raise HTTPException(status_code=400, detail="No file uploaded")
 
@@ -14,24 +16,93 @@ class FileController:
             # Save file using FileService
             chatbot_file = FileService.upload_file(file)
 
-            # Trigger vector building in background
-            background_tasks.add_task(
-                VectorService.build_index,
-                chatbot_file.filepath
-            )
+            # Queue vector building on the ingestion workers
+            try:
+                job = IngestionJobService.submit(chatbot_file.id, chatbot_file.filepath)
+            except IngestionQueueFull:
+                # Not queued, so never indexed: drop the row and file again
+                # rather than list a document nobody can search
+                FileService.delete_file(chatbot_file.id)
+                raise
 
             return {
                 "message": "File uploaded successfully. Vector index building started.",
-                "file_id": chatbot_file.id
+                "file_id": chatbot_file.id,
+                "job_id": job.id
             }
 
+        except IngestionQueueFull:
+            raise HTTPException(status_code=429, detail="Too many pending ingestion jobs, try again later")
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
 
+    @staticmethod
+    def list_files():
+        return FileService.list_files()
+
+    @staticmethod
+    def delete_file(file_id: str):
+        chatbot_file = FileService.get_file(file_id)
+        if not chatbot_file:
+            raise HTTPException(status_code=404, detail="File not found")
+
+        # Queue the vector removal first: when the queue is full nothing has
+        # been touched yet and the client can simply retry
+        try:
+            job = IngestionJobService.submit(file_id, chatbot_file.filepath, action="delete")
+        except IngestionQueueFull:
+            raise HTTPException(status_code=429, detail="Too many pending ingestion jobs, try again later")
+
+        # Stop any build of this document, then drop the row and upload; the
+        # job removes the vectors by id and needs neither
+        IngestionJobService.cancel_file(file_id)
+        FileService.delete_file(file_id)
+
+        return {"message": "File deleted. Removing its vectors.", "file_id": file_id, "job_id": job.id}
+
+    @staticmethod
+    def list_jobs():
+        return [job.to_dict() for job in IngestionJobService.list_jobs()]
+
+    @staticmethod
+    def job_status(job_id: str):
+        job = IngestionJobService.get(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job.to_dict()
+
+    @staticmethod
+    def cancel_job(job_id: str):
+        job = IngestionJobService.cancel(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return {"message": "Cancellation requested", "job_id": job.id}
+
     @staticmethod
     def vector_status():
+        # Status of the most recent upload, kept for the existing file page
+        job = IngestionJobService.latest()
+        if not job:
+            return {"status": "idle", "progress": 0, "time_taken": 0}
+        return job.to_dict()
+
+    @staticmethod
+    def cancel_latest():
+        job = IngestionJobService.latest()
+        if job:
+            IngestionJobService.cancel(job.id)
+        return {"message": "Cancellation requested"}
+
+    @staticmethod
+    def list_snapshots():
         return {
-            "status": VectorService.status,
-            "progress": VectorService.progress,
-            "time_taken": VectorService.time_taken
+            "current": IndexStore.current_name(),
+            "snapshots": IndexStore.list_snapshots()
         }
+
+    @staticmethod
+    def rollback(snapshot: Optional[str] = None):
+        published = IngestionJobService.rollback(snapshot)
+        if not published:
+            raise HTTPException(status_code=404, detail="No snapshot to roll back to")
+        return {"message": "Rolled back", "current": published.name}
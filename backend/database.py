@@ -1,6 +1,7 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy import text
+from sqlalchemy import text, inspect, make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 import os
 from dotenv import load_dotenv
 
@@ -27,3 +28,68 @@ except Exception as e:
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+
+
+# =====================================
+# ASYNC ENGINE (chat, history, threads)
+# =====================================
+# Own pool, used from the event loop: queries on the chat paths never block
+# it. The sync engine above stays for startup DDL and the admin/contact/file
+# routes.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+
+_ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def async_url(url: str):
+    # Same database through its async driver; ASYNC_DATABASE_URL overrides
+    url = make_url(url)
+    url = url.set(drivername=_ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+    if url.drivername == "postgresql+asyncpg" and "sslmode" in url.query:
+        # libpq option; asyncpg calls it ssl
+        url = url.update_query_dict({"ssl": url.query["sslmode"]}).difference_update_query(["sslmode"])
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_url(DATABASE_URL)
+
+_pool_options = {}
+if make_url(ASYNC_DATABASE_URL).database not in (None, "", ":memory:"):  # in-memory SQLite has a single connection
+    _pool_options = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_pre_ping": True,
+    }
+
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_pool_options)
+
+# Objects stay readable after commit, so nothing lazy-loads outside a session
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def ensure_columns(table):
+    # create_all() only creates missing tables; columns added to an existing
+    # model later are added here (they must be nullable or have a server default)
+    existing = {c["name"] for c in inspect(engine).get_columns(table.name, schema=table.schema)}
+    preparer = engine.dialect.identifier_preparer
+
+    with engine.begin() as conn:
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = (
+                f"ALTER TABLE {preparer.format_table(table)} "
+                f"ADD COLUMN {preparer.quote(column.name)} {column.type.compile(engine.dialect)}"
+            )
+            if column.server_default is not None:
+                ddl += f" DEFAULT {column.server_default.arg}"
+            conn.execute(text(ddl))
+            print(f"Added column {table.name}.{column.name}")
@@ -1,17 +1,35 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from database import Base, engine
+from database import Base, engine, async_engine, ensure_columns
+from models import Thread, Message
 from routes.contact_route import router as ContactRouter
 from routes.admin_routes import router as AdminRouter
 from routes.chat_route import router as ChatRouter
 from routes.file_routes import router as FileRouter
+from services.llm_client import llm_client, LLM_WARMUP
 
 import uvicorn
 
 # Create DB tables
 Base.metadata.create_all(bind=engine)
+ensure_columns(Thread.__table__)
+ensure_columns(Message.__table__)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the model in the background; startup does not wait for it
+    warmup = asyncio.create_task(llm_client.warmup()) if LLM_WARMUP else None
+    yield
+    if warmup is not None:
+        warmup.cancel()
+    await llm_client.close()
+    await async_engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,6 +37,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After", "X-Stream-Id"],
 )
 
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, func , ForeignKey , Text
+from sqlalchemy import Column, Integer, String, DateTime, func , ForeignKey , Text , text , Boolean , false
 from database import Base
 from sqlalchemy.orm import relationship
 
@@ -38,6 +38,9 @@ class Thread(Base):
     user_id = Column(String, nullable=True)
     title = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Rolling summary of the oldest `summarized_count` messages
+    summary = Column(Text, nullable=True)
+    summarized_count = Column(Integer, nullable=False, server_default=text("0"))
     messages = relationship("Message", backref="thread", cascade="all, delete")
 
 
@@ -48,6 +51,8 @@ class Message(Base):
     thread_id = Column(String, ForeignKey("threads.id", ondelete="CASCADE"))
     sender = Column(String)  
     text = Column(Text)
+    # Bot answer cut short because the client disconnected
+    truncated = Column(Boolean, nullable=False, server_default=false())
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
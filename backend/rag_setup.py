@@ -1,8 +1,8 @@
 import os
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.embeddings import HuggingFaceEmbeddings
 from langchain.vectorstores import FAISS
 from langchain.document_loaders import PyPDFLoader, TextLoader, Docx2txtLoader
+from services.embedding_service import embedding_engine
 
 # 1️⃣ Path to uploaded file
 UPLOAD_DIR = "uploads"
@@ -33,8 +33,8 @@ text_splitter = RecursiveCharacterTextSplitter(
 )
 docs = text_splitter.split_documents(documents)
 
-# 4️⃣ Create embeddings using Hugging Face model
-embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+# 4️⃣ Create embeddings using the shared Hugging Face model
+embeddings = embedding_engine
 
 # 5️⃣ Store vectors in FAISS
 vector_store = FAISS.from_documents(docs, embeddings)
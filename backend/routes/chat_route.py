@@ -1,25 +1,28 @@
-from fastapi import APIRouter , Query , Depends
+from fastapi import APIRouter , Query , Depends , Request , Header
 from controllers.chat_controller import ChatController
 from schemas.chat_schema import ChatRequest
 from fastapi.responses import StreamingResponse
 from typing import Optional
-from sqlalchemy.orm import Session
-from database import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
 
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.post("/send")
-async def send_message(data: ChatRequest):
+async def send_message(data: ChatRequest, request: Request):
     # Return streaming response from controller
-    return await ChatController.process_stream(data)
+    return await ChatController.process_stream(data, request)
+
+@router.get("/resume/{stream_id}")
+async def resume_stream(
+    stream_id: str,                                       # X-Stream-Id of the original response
+    request: Request,
+    last_event_id: Optional[str] = Header(None),          # sent by EventSource on reconnect
+    last_event: Optional[str] = Query(None, alias="last_event_id")
+):
+    # Continue an answer stream after the last event the client received
+    return await ChatController.resume_stream(request, stream_id, last_event_id or last_event)
 
 @router.get("/history/{thread_id}")
 async def get_chat_history(
@@ -31,6 +34,10 @@ async def get_chat_history(
     return await ChatController.fetch_chat_history(thread_id, limit=limit, offset=offset)  
 
 @router.get("/threads")
-def get_threads(db: Session = Depends(get_db)):
+async def get_threads(db: AsyncSession = Depends(get_async_db)):
     
-    return ChatController.fetch_threads(db)
\ No newline at end of file
+    return await ChatController.fetch_threads(db)
+
+@router.get("/stats")
+def get_stats():
+    return ChatController.fetch_stats()
@@ -1,15 +1,36 @@
-from fastapi import APIRouter, UploadFile, File, BackgroundTasks
+from fastapi import APIRouter, UploadFile, File
+from typing import Optional
 from controllers.file_controller import FileController
-from services.vector_service import VectorService
 router = APIRouter(prefix="/file", tags=["File"])
 
 
 @router.post("/upload")
 async def upload_file(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...)
 ):
-    return FileController.upload(file, background_tasks)
+    return FileController.upload(file)
+
+
+@router.get("/list")
+def list_files():
+    return FileController.list_files()
+
+@router.delete("/{file_id}")
+def delete_file(file_id: str):
+    return FileController.delete_file(file_id)
+
+
+@router.get("/jobs")
+def list_jobs():
+    return FileController.list_jobs()
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    return FileController.job_status(job_id)
+
+@router.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    return FileController.cancel_job(job_id)
 
 
 @router.get("/vector-status")
@@ -18,5 +39,13 @@ def get_vector_status():
 
 @router.post("/vector-cancel")
 def cancel_vector():
-    VectorService.cancel()
-    return {"message": "Cancellation requested"}
+    return FileController.cancel_latest()
+
+
+@router.get("/index/snapshots")
+def list_snapshots():
+    return FileController.list_snapshots()
+
+@router.post("/index/rollback")
+def rollback_index(snapshot: Optional[str] = None):
+    return FileController.rollback(snapshot)
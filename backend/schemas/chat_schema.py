@@ -1,5 +1,8 @@
 from pydantic import BaseModel
+from typing import List, Optional
 
 class ChatRequest(BaseModel):
     message: str
     thread_id: str
+    # Restrict retrieval to these documents (ChatbotFile ids); all when omitted
+    file_ids: Optional[List[str]] = None
@@ -0,0 +1,119 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent.parent  # project root
+sys.path.insert(0, str(BASE_DIR))
+
+from services import ann_index
+from services.index_store import IndexStore
+
+# =====================================
+# ANN INDEX RECALL / LATENCY BENCHMARK
+# =====================================
+# Builds every index type over the same vectors and compares it with the
+# exact flat index: recall@k, single-query p50/p99 latency, build time and
+# serialized size. Vectors are synthetic clustered "embeddings" unless
+# --from-index reuses the ones stored in the live snapshot.
+
+
+def synthetic_vectors(n, dim, clusters, seed=0):
+    # Sentence embeddings are clustered by topic, not uniform noise
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, n)
+    vectors = centers[labels] + 0.35 * rng.standard_normal((n, dim)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def stored_vectors():
+    path = IndexStore.current_path()
+    if path is None:
+        raise SystemExit("❌ No index to read vectors from.")
+    _, vectors = ann_index.stored_vectors(IndexStore.load(path).index)
+    return vectors
+
+
+def search_latencies(index, queries, k):
+    latencies = []
+    results = np.empty((len(queries), k), dtype=np.int64)
+    for i in range(len(queries)):
+        start = time.perf_counter()
+        _, ids = index.search(queries[i:i + 1], k)
+        latencies.append(time.perf_counter() - start)
+        results[i] = ids[0]
+    latencies.sort()
+    return results, latencies
+
+
+def recall_at_k(results, truth):
+    hits = sum(len(set(r) & set(t)) for r, t in zip(results, truth))
+    return hits / truth.size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)  # all-MiniLM-L6-v2
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--types", nargs="+", default=list(ann_index.INDEX_TYPES))
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[ann_index.IVF_NPROBE])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[ann_index.HNSW_EF_SEARCH])
+    parser.add_argument("--from-index", action="store_true")
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(1)  # per-request search is single-threaded
+
+    if args.from_index:
+        data = stored_vectors()
+    else:
+        data = synthetic_vectors(args.vectors + args.queries, args.dim, args.clusters)
+
+    queries = np.ascontiguousarray(data[-args.queries:])
+    vectors = np.ascontiguousarray(data[:-args.queries])
+    dim = vectors.shape[1]
+    print(f"📊 {len(vectors)} vectors x {dim} dims, {len(queries)} queries, k={args.k}\n")
+
+    flat = faiss.IndexFlatL2(dim)
+    flat.add(vectors)
+    truth, _ = search_latencies(flat, queries, args.k)
+
+    print(f"{'index':<22}{'param':>12}{'recall':>9}{'p50':>11}{'p99':>11}{'build':>10}{'size':>11}")
+
+    for index_type in args.types:
+        start = time.perf_counter()
+        index = ann_index.create_index(dim, index_type, vectors[:ann_index.ANN_TRAIN_SAMPLE])
+        index.add(vectors)
+        build = time.perf_counter() - start
+        size_mb = len(faiss.serialize_index(index)) / 1e6
+
+        if faiss.try_extract_index_ivf(index) is not None:
+            params = [("nprobe", n, {"nprobe": n}) for n in args.nprobe]
+        elif "HNSW" in ann_index.describe(index):
+            params = [("efSearch", ef, {"ef_search": ef}) for ef in args.ef_search]
+        else:
+            params = [("-", "", {})]
+
+        for name, value, kwargs in params:
+            ann_index.apply_search_params(index, **kwargs)
+            results, latencies = search_latencies(index, queries, args.k)
+            label = f"{name}={value}" if value != "" else name
+            print(
+                f"{ann_index.describe(index):<22}{label:>12}"
+                f"{recall_at_k(results, truth):>9.3f}"
+                f"{latencies[len(latencies) // 2] * 1000:>9.3f}ms"
+                f"{latencies[int(len(latencies) * 0.99) - 1] * 1000:>9.3f}ms"
+                f"{build:>9.1f}s"
+                f"{size_mb:>9.1f}MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import event, func, select, delete
+from fake_ollama import FakeOllama
+
+BASE_DIR = Path(__file__).resolve().parent.parent  # project root
+sys.path.insert(0, str(BASE_DIR))
+
+# Throwaway SQLite file unless DATABASE_URL points somewhere else
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{Path(tempfile.gettempdir()) / 'chatbot_bench_db.sqlite'}"
+)
+
+from database import Base, engine, async_engine, SessionLocal, AsyncSessionLocal
+from models import Thread, Message
+from services.chat_service import ChatService
+from services.conversation_memory import ConversationMemory, MEMORY_RECENT_MESSAGES, MEMORY_SUMMARY_EVERY
+from services.llm_client import LLMClient
+
+# =====================================
+# DATABASE CONCURRENCY BENCHMARK
+# =====================================
+# Keeps --streams chat answers streaming (fake Ollama) while one client
+# reads a thread's history in a loop, and reports how long those reads take.
+# Each answer does the same DB work as /chat/send: thread lookup, memory
+# load and user message insert before streaming, bot message insert after.
+#   sync  - the previous code path: sync sessions queried on the event loop
+#           (bot message saved from the threadpool)
+#   async - AsyncSession (ChatService / ConversationMemory as they are now)
+# On SQLite, --db-latency adds a round trip per statement in whichever
+# thread runs it, standing in for a network database. Point DATABASE_URL at
+# Postgres (and pass --db-latency 0) to measure the real thing; bench rows
+# are deleted afterwards.
+
+PREFIX = "bench-"
+TICK = 0.005
+
+# How late each TICK wake-up of the server's event loop was: time it spent
+# blocked (or too busy) to run anything else
+loop_stalls = []
+
+
+def add_latency(seconds):
+    def round_trip(_statement):
+        time.sleep(seconds)
+
+    @event.listens_for(engine, "connect")
+    def sync_connect(dbapi_connection, _):
+        dbapi_connection.execute("PRAGMA journal_mode=WAL")
+        dbapi_connection.set_trace_callback(round_trip)
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def async_connect(dbapi_connection, _):
+        dbapi_connection.run_async(lambda conn: conn.set_trace_callback(round_trip))
+
+    engine.dispose()  # drop the connection made at import time
+
+
+def seed(threads, messages):
+    Base.metadata.create_all(bind=engine, tables=[Thread.__table__, Message.__table__])
+    cleanup()
+    db = SessionLocal()
+    try:
+        for thread_id in threads:
+            db.add(Thread(id=thread_id))
+            for i in range(messages):
+                db.add(Message(
+                    id=str(uuid.uuid4()),
+                    thread_id=thread_id,
+                    sender="user" if i % 2 == 0 else "bot",
+                    text=f"message {i} " + "lorem ipsum " * 20,
+                ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def cleanup():
+    db = SessionLocal()
+    try:
+        db.execute(delete(Message).where(Message.thread_id.startswith(PREFIX)))
+        db.execute(delete(Thread).where(Thread.id.startswith(PREFIX)))
+        db.commit()
+    finally:
+        db.close()
+
+
+# --- previous code path (sync sessions) ---
+
+def sync_history(thread_id: str, limit: int = 50):
+    db = SessionLocal()
+    try:
+        messages = (
+            db.query(Message)
+            .filter(Message.thread_id == thread_id)
+            .order_by(Message.created_at)
+            .limit(limit)
+            .all()
+        )
+        return [{"sender": m.sender, "text": m.text, "truncated": m.truncated} for m in messages]
+    finally:
+        db.close()
+
+
+def sync_prepare(thread_id: str, question: str):
+    db = SessionLocal()
+    try:
+        db.query(Thread).filter(Thread.id == thread_id).first()
+        db.query(func.count(Message.id)).filter(Message.thread_id == thread_id).scalar()
+        (
+            db.query(Message)
+            .filter(Message.thread_id == thread_id)
+            .order_by(Message.created_at.desc(), Message.id.desc())
+            .limit(MEMORY_RECENT_MESSAGES + MEMORY_SUMMARY_EVERY - 1)
+            .all()
+        )
+        db.add(Message(id=str(uuid.uuid4()), thread_id=thread_id, sender="user", text=question))
+        db.commit()
+    finally:
+        db.close()
+
+
+def sync_save(thread_id: str, text: str):
+    db = SessionLocal()
+    try:
+        db.add(Message(id=str(uuid.uuid4()), thread_id=thread_id, sender="bot", text=text, truncated=False))
+        db.commit()
+    finally:
+        db.close()
+
+
+# --- current code path ---
+
+async def async_prepare(thread_id: str, question: str):
+    async with AsyncSessionLocal() as db:
+        thread = await db.scalar(select(Thread).where(Thread.id == thread_id))
+        await ConversationMemory.load(db, thread)
+        db.add(Message(id=str(uuid.uuid4()), thread_id=thread_id, sender="user", text=question))
+        await db.commit()
+
+
+async def watch_loop():
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        loop_stalls.append(time.perf_counter() - start - TICK)
+
+
+def build_app(client):
+    @asynccontextmanager
+    async def lifespan(app):
+        watcher = asyncio.create_task(watch_loop())
+        yield
+        watcher.cancel()
+
+    app = FastAPI(lifespan=lifespan)
+
+    @app.get("/{mode}/history/{thread_id}")
+    async def history(mode: str, thread_id: str):
+        if mode == "sync":
+            return sync_history(thread_id)
+        return await ChatService.get_chat_history(thread_id)
+
+    @app.get("/{mode}/ask/{thread_id}")
+    async def ask(mode: str, thread_id: str):
+        question = f"question {uuid.uuid4().hex[:8]}"
+        if mode == "sync":
+            sync_prepare(thread_id, question)
+        else:
+            await async_prepare(thread_id, question)
+
+        async def answer():
+            reply = []
+            async for token in client.stream(question):
+                reply.append(token)
+                yield token
+            if mode == "sync":
+                await run_in_threadpool(sync_save, thread_id, "".join(reply))
+            else:
+                await ChatService._save_reply(thread_id, "".join(reply), False)
+
+        return StreamingResponse(answer(), media_type="text/event-stream")
+
+    return app
+
+
+def serve(app):
+    sock = socket.socket()
+    # Accepted connections inherit it; otherwise Nagle + delayed ACK add
+    # ~40ms to every small response and hide what is being measured
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, thread, f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+async def run(url, mode, streams, duration, interval):
+    stop = time.monotonic() + duration
+    answers = 0
+    latencies = []
+
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=httpx.Limits(max_connections=streams + 4)) as http:
+        async def streamer(i):
+            nonlocal answers
+            while time.monotonic() < stop:
+                async with http.stream("GET", f"/{mode}/ask/{PREFIX}{i}") as response:
+                    async for _ in response.aiter_bytes():
+                        pass
+                answers += 1
+
+        async def prober():
+            await asyncio.sleep(0.5)  # let the streams get going
+            loop_stalls.clear()
+            while time.monotonic() < stop:
+                start = time.perf_counter()
+                response = await http.get(f"/{mode}/history/{PREFIX}probe")
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(interval)
+
+        await asyncio.gather(prober(), *[streamer(i) for i in range(streams)])
+
+    return answers, latencies, sorted(loop_stalls)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--streams", type=int, default=32, help="concurrent streaming answers")
+    parser.add_argument("--duration", type=float, default=8.0, help="seconds per mode")
+    parser.add_argument("--db-latency", type=float, default=2.0, help="ms added per statement (SQLite only)")
+    parser.add_argument("--interval", type=float, default=0.02, help="seconds between history reads")
+    args = parser.parse_args()
+
+    sqlite = engine.dialect.name == "sqlite"
+    if sqlite:
+        add_latency(args.db_latency / 1000)
+    seed([f"{PREFIX}{i}" for i in range(args.streams)] + [f"{PREFIX}probe"], messages=40)
+
+    fake = FakeOllama(token_count=50, first_token_delay=0.05, token_delay=0.02).start()
+    client = LLMClient(base_url=fake.base_url, model="fake")
+    server, thread, url = serve(build_app(client))
+
+    print(
+        f"{engine.dialect.name}{f' +{args.db_latency:.0f}ms/statement' if sqlite else ''}, "
+        f"{args.streams} concurrent answers, {args.duration:.0f}s per mode\n"
+    )
+    print(f"{'':<17}{'history read':^30}{'loop stall':^20}")
+    print(f"{'mode':<7}{'answers/s':>10}{'p50':>10}{'p95':>10}{'max':>10}{'p99':>10}{'max':>10}")
+    try:
+        for mode in ("sync", "async"):
+            answers, latencies, stalls = asyncio.run(run(url, mode, args.streams, args.duration, args.interval))
+            latencies.sort()
+            print(
+                f"{mode:<7}{answers / args.duration:>10.1f}"
+                f"{statistics.median(latencies) * 1000:>8.1f}ms"
+                f"{latencies[int(len(latencies) * 0.95)] * 1000:>8.1f}ms"
+                f"{latencies[-1] * 1000:>8.1f}ms"
+                f"{stalls[int(len(stalls) * 0.99)] * 1000:>8.1f}ms"
+                f"{stalls[-1] * 1000:>8.1f}ms"
+            )
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+        fake.stop()
+        cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import argparse
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent  # project root
+sys.path.insert(0, str(BASE_DIR))
+
+from services.embedding_service import embedding_engine
+from services.vector_index import VectorIndex, chunk_hash
+from services.retrieval_service import reciprocal_rank_fusion, HYBRID_CANDIDATES
+
+# =====================================
+# HYBRID VS VECTOR-ONLY RETRIEVAL BENCHMARK
+# =====================================
+# A synthetic support knowledge base where every chunk carries an exact
+# identifier (error code, product code or person's name) inside otherwise
+# similar prose. Each query asks about one identifier; a hit means the chunk
+# holding it is in the top k. Runs against a throwaway index, never the
+# live one.
+
+TOPICS = [
+    "The device shows {code} when the firmware update is interrupted. Restart it and retry the update.",
+    "Order {code} ships from the central warehouse within two business days after payment.",
+    "Error {code} means the license key is expired. Renew the subscription from the billing page.",
+    "{name} from the support team handles escalations for enterprise customers in the region.",
+    "Replacement part {code} fits all models sold after 2021 and includes a two year warranty.",
+    "If the dashboard reports {code}, the sync service lost its database connection.",
+]
+FIRST = ["Anika", "Bruno", "Chen", "Dalia", "Emeka", "Farah", "Goran", "Hana", "Ivo", "Jun"]
+LAST = ["Okafor", "Lindqvist", "Moreau", "Tanaka", "Silva", "Novak", "Haddad", "Kowalski"]
+QUESTIONS = {
+    "code": ["what does {code} mean", "how do I fix {code}", "tell me about {code}"],
+    "name": ["who is {name}", "what does {name} handle"],
+}
+
+
+def build_corpus(n, rng):
+    chunks, keys = [], []
+    for i in range(n):
+        template = TOPICS[i % len(TOPICS)]
+        if "{name}" in template:
+            key = f"{rng.choice(FIRST)} {rng.choice(LAST)}-{i}"
+            chunks.append(template.format(name=key))
+        else:
+            key = f"{rng.choice('EPXK')}-{rng.randint(1000, 9999)}{i}"
+            chunks.append(template.format(code=key))
+        keys.append(key)
+    return chunks, keys
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    chunks, keys = build_corpus(args.chunks, rng)
+    workdir = Path(tempfile.mkdtemp(prefix="bench-hybrid-"))
+
+    try:
+        print(f"🧠 Embedding {len(chunks)} synthetic chunks...")
+        writable = VectorIndex(workdir, writable=True)
+        for i in range(0, len(chunks), 256):
+            batch = chunks[i:i + 256]
+            writable.add(batch, embedding_engine.embed_documents(batch), [chunk_hash(c) for c in batch], "synthetic")
+        writable.save()
+        index = VectorIndex.open(workdir)
+
+        targets = rng.sample(range(len(chunks)), args.queries)
+        queries = []
+        for target in targets:
+            kind = "name" if "{name}" in TOPICS[target % len(TOPICS)] else "code"
+            queries.append((target, rng.choice(QUESTIONS[kind]).format(**{kind: keys[target]})))
+
+        vectors = [embedding_engine.embed_query(q) for _, q in queries]
+        candidates = max(args.k, HYBRID_CANDIDATES)
+
+        modes = {
+            "vector": lambda q, v: index.search(v, args.k),
+            "bm25": lambda q, v: index.lexical_search(q, args.k),
+            "hybrid": lambda q, v: reciprocal_rank_fusion(
+                [index.search(v, candidates), index.lexical_search(q, candidates)]
+            )[:args.k],
+        }
+
+        print(f"\n{len(queries)} queries, k={args.k} (query embedding excluded from latency)\n")
+        print(f"{'mode':<10}{'hit@k':>8}{'p50':>12}{'p99':>12}")
+        for mode, search in modes.items():
+            hits, latencies = 0, []
+            for (target, question), vector in zip(queries, vectors):
+                start = time.perf_counter()
+                ids = search(question, vector)
+                latencies.append(time.perf_counter() - start)
+                hits += target in ids
+            print(
+                f"{mode:<10}{hits / len(queries):>8.3f}"
+                f"{percentile(latencies, 0.5) * 1000:>10.3f}ms"
+                f"{percentile(latencies, 0.99) * 1000:>10.3f}ms"
+            )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+from langchain_community.chat_models import ChatOllama
+from fake_ollama import FakeOllama
+
+BASE_DIR = Path(__file__).resolve().parent.parent  # project root
+sys.path.insert(0, str(BASE_DIR))
+
+from services.llm_client import LLMClient
+
+# =====================================
+# POOLED LLM CLIENT VS PER-REQUEST CHATOLLAMA
+# =====================================
+# Sends the same questions through a new ChatOllama per request (the old
+# generate_stream behaviour) and through one shared LLMClient, against the
+# fake Ollama server. Reports latency, TCP connections opened and model
+# loads. The fake server unloads the model after --server-keep-alive idle
+# seconds unless the request asks for longer, which the shared client does.
+
+
+async def per_request(server, prompt):
+    llm = ChatOllama(model="fake", base_url=server.base_url, temperature=0.2, streaming=True)
+    async for chunk in llm.astream(prompt):
+        if chunk.content:
+            yield chunk.content
+
+
+def pooled_source(client):
+    async def pooled(server, prompt):
+        async for token in client.stream(prompt):
+            yield token
+    return pooled
+
+
+async def ask(source, server, prompt):
+    start = time.perf_counter()
+    ttft = None
+    async for _ in source(server, prompt):
+        if ttft is None:
+            ttft = time.perf_counter() - start
+    return ttft, time.perf_counter() - start
+
+
+async def run(source, server, requests, concurrency, gap):
+    results = []
+    for i in range(0, requests, concurrency):
+        if i and gap:
+            await asyncio.sleep(gap)
+        batch = range(i, min(requests, i + concurrency))
+        results += await asyncio.gather(*[ask(source, server, f"question {n}") for n in batch])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--tokens", type=int, default=20)
+    parser.add_argument("--first-token-delay", type=float, default=0.02)
+    parser.add_argument("--token-delay", type=float, default=0.002)
+    parser.add_argument("--load-delay", type=float, default=0.5, help="simulated model load (s)")
+    parser.add_argument("--server-keep-alive", type=float, default=1.0, help="Ollama default keep_alive (s)")
+    parser.add_argument("--gap", type=float, default=1.5, help="idle time between batches in the idle scenario (s)")
+    args = parser.parse_args()
+
+    server = FakeOllama(
+        token_count=args.tokens,
+        first_token_delay=args.first_token_delay,
+        token_delay=args.token_delay,
+        load_delay=args.load_delay,
+        default_keep_alive=args.server_keep_alive,
+    ).start()
+
+    scenarios = (
+        ("busy", args.requests, 0.0),
+        ("idle gaps", args.concurrency * 4, args.gap),
+    )
+
+    print(f"{'scenario':<11}{'client':<13}{'reqs':>5}{'ttft p50':>11}{'total p50':>11}{'total max':>11}{'conns':>7}{'loads':>7}")
+    for scenario, requests, gap in scenarios:
+        for name in ("per-request", "pooled"):
+            client = LLMClient(base_url=server.base_url, model="fake")
+            source = per_request if name == "per-request" else pooled_source(client)
+
+            async def measure():
+                try:
+                    return await run(source, server, requests, args.concurrency, gap)
+                finally:
+                    await client.close()
+
+            server._resident_until = 0.0  # every run starts with the model unloaded
+            connections, loads = server.connections, server.model_loads
+            results = asyncio.run(measure())
+
+            ttfts = [r[0] for r in results]
+            totals = [r[1] for r in results]
+            print(
+                f"{scenario:<11}{name:<13}{len(results):>5}"
+                f"{statistics.median(ttfts) * 1000:>9.1f}ms"
+                f"{statistics.median(totals) * 1000:>9.1f}ms"
+                f"{max(totals) * 1000:>9.1f}ms"
+                f"{server.connections - connections:>7}"
+                f"{server.model_loads - loads:>7}"
+            )
+
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+from langchain_community.chat_models import ChatOllama
+from fake_ollama import FakeOllama
+
+BASE_DIR = Path(__file__).resolve().parent.parent  # project root
+sys.path.insert(0, str(BASE_DIR))
+
+from services.llm_client import LLMClient
+
+# =====================================
+# CONCURRENT STREAMING BENCHMARK
+# =====================================
+# Runs N chat streams at once on a single event loop against a fake Ollama
+# server and compares the original blocking `ChatOllama.stream()` loop with
+# the async path /chat/send uses now (the shared pooled LLMClient).
+# A probe task measures how long the loop is stalled (what a concurrent
+# /file/vector-status poll would feel).
+
+
+async def blocking_source(llm, prompt):
+    # Original behaviour: sync iterator inside an async generator
+    for chunk in llm.stream(prompt):
+        yield chunk.content
+
+
+async def async_source(client, prompt):
+    async for token in client.stream(prompt):
+        yield token
+
+
+async def consume(source, llm, prompt, start):
+    # Measured from when all requests arrived, not when this one got the loop
+    ttft = None
+    async for token in source(llm, prompt):
+        if ttft is None and token:
+            ttft = time.perf_counter() - start
+    return ttft, time.perf_counter() - start
+
+
+async def loop_probe(stop: asyncio.Event, interval=0.005):
+    worst = 0.0
+    while not stop.is_set():
+        before = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - before - interval)
+    return worst
+
+
+async def run(source, llm, concurrency):
+    # Untimed: opens the client's connection pool, as the app does at startup
+    await consume(source, llm, "warmup", time.perf_counter())
+
+    stop = asyncio.Event()
+    probe = asyncio.create_task(loop_probe(stop))
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *[consume(source, llm, f"question {i}", start) for i in range(concurrency)]
+    )
+    wall = time.perf_counter() - start
+    stop.set()
+    stall = await probe
+
+    ttfts = sorted(r[0] for r in results)
+    return {
+        "ttft_p50": statistics.median(ttfts),
+        "ttft_max": ttfts[-1],
+        "wall": wall,
+        "stall": stall,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--first-token-delay", type=float, default=0.05)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    args = parser.parse_args()
+
+    server = FakeOllama(
+        token_count=args.tokens,
+        first_token_delay=args.first_token_delay,
+        token_delay=args.token_delay,
+    ).start()
+    llm = ChatOllama(model="fake", base_url=server.base_url, streaming=True)
+    client = LLMClient(base_url=server.base_url, model="fake")
+
+    print(f"{'mode':<10}{'N':>5}{'ttft p50':>12}{'ttft max':>12}{'wall':>10}{'max stall':>12}")
+    for mode, source, llm in (("blocking", blocking_source, llm), ("async", async_source, client)):
+        for n in args.concurrency:
+            r = asyncio.run(run(source, llm, n))
+            print(
+                f"{mode:<10}{n:>5}"
+                f"{r['ttft_p50'] * 1000:>10.1f}ms{r['ttft_max'] * 1000:>10.1f}ms"
+                f"{r['wall']:>9.2f}s{r['stall'] * 1000:>10.1f}ms"
+            )
+
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
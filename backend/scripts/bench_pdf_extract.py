@@ -0,0 +1,91 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent  # project root
+sys.path.insert(0, str(BASE_DIR))
+
+from services.document_reader import iter_pdf_pages
+
+# =====================================
+# PARALLEL PDF EXTRACTION BENCHMARK
+# =====================================
+# Writes a synthetic text-heavy PDF and times page extraction with an
+# increasing number of pool workers. 1 worker is the old in-process loop.
+
+WORDS = "invoice warranty battery install reset firmware router cable manual support".split()
+
+
+def write_synthetic_pdf(path: Path, pages: int, lines_per_page: int = 60):
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once page ids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+
+    for p in range(pages):
+        lines = []
+        for l in range(lines_per_page):
+            words = " ".join(WORDS[(p + l + i) % len(WORDS)] for i in range(12))
+            lines.append(f"({p}-{l} {words}) Tj T*")
+        stream = ("BT /F1 9 Tf 11 TL 40 800 Td " + " ".join(lines) + " ET").encode()
+
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+
+    kids = " ".join(f"{i} 0 R" for i in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % pages
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+
+    path.write_bytes(bytes(out))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--pages-per-task", type=int, default=16)
+    parser.add_argument("--workers", type=int, nargs="+")
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    workers_list = args.workers or sorted({1, 2, 4, cores} & set(range(1, cores + 1)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = Path(tmp) / "synthetic.pdf"
+        write_synthetic_pdf(pdf_path, args.pages)
+        print(f"📄 {args.pages} pages, {pdf_path.stat().st_size / 1e6:.1f} MB, {cores} cores\n")
+
+        baseline = None
+        print(f"{'workers':>8}{'seconds':>10}{'pages/s':>10}{'speed-up':>10}")
+        for workers in workers_list:
+            start = time.perf_counter()
+            pages = list(iter_pdf_pages(pdf_path, workers=workers, pages_per_task=args.pages_per_task))
+            elapsed = time.perf_counter() - start
+
+            assert [n for n, _ in pages] == list(range(1, args.pages + 1)), "page order broken"
+            baseline = baseline or elapsed
+            print(f"{workers:>8}{elapsed:>10.2f}{args.pages / elapsed:>10.1f}{baseline / elapsed:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
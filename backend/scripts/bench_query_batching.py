@@ -0,0 +1,90 @@
+import argparse
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent  # project root
+sys.path.insert(0, str(BASE_DIR))
+
+from services.embedding_service import (
+    embedding_engine,
+    QueryBatcher,
+    EMBEDDING_BATCH_WINDOW_MS,
+    EMBEDDING_MAX_BATCH,
+)
+
+# =====================================
+# QUERY EMBEDDING THROUGHPUT BENCHMARK
+# =====================================
+# N threads (like N concurrent /chat/send requests in the threadpool) each
+# embed a stream of questions. Compares one forward pass per query against
+# the micro-batching QueryBatcher.
+
+QUESTIONS = [
+    "what are your opening hours",
+    "how do I reset my password",
+    "where can I find the installation guide",
+    "which payment methods are accepted",
+    "how long does delivery take",
+    "can I cancel my subscription",
+]
+
+
+def run(embed, concurrency, per_thread):
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(offset):
+        local = []
+        for i in range(per_thread):
+            text = f"{QUESTIONS[(offset + i) % len(QUESTIONS)]} {offset}-{i}"
+            before = time.perf_counter()
+            embed(text)
+            local.append(time.perf_counter() - before)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "qps": len(latencies) / wall,
+        "p50": statistics.median(latencies),
+        "p99": latencies[int(len(latencies) * 0.99) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--queries", type=int, default=20, help="queries per thread")
+    parser.add_argument("--window-ms", type=float, default=EMBEDDING_BATCH_WINDOW_MS or 5)
+    parser.add_argument("--max-batch", type=int, default=EMBEDDING_MAX_BATCH)
+    args = parser.parse_args()
+
+    print("🔄 Loading embedding model...")
+    embedding_engine.embed_documents(["warmup"])
+
+    direct = lambda text: embedding_engine._encode([text])[0]
+    batcher = QueryBatcher(embedding_engine._encode, args.window_ms, args.max_batch)
+
+    print(f"\nwindow={args.window_ms}ms max_batch={args.max_batch}\n")
+    print(f"{'mode':<10}{'N':>5}{'qps':>10}{'p50':>12}{'p99':>12}")
+    for n in args.concurrency:
+        for mode, embed in (("direct", direct), ("batched", batcher.submit)):
+            r = run(embed, n, args.queries)
+            print(f"{mode:<10}{n:>5}{r['qps']:>10.1f}{r['p50'] * 1000:>10.1f}ms{r['p99'] * 1000:>10.1f}ms")
+
+    print(f"\nBatcher: {batcher.stats()}")
+
+
+if __name__ == "__main__":
+    main()
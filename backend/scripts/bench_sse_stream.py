@@ -0,0 +1,142 @@
+import argparse
+import asyncio
+import socket
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fake_ollama import FakeOllama
+
+BASE_DIR = Path(__file__).resolve().parent.parent  # project root
+sys.path.insert(0, str(BASE_DIR))
+
+from services.llm_client import LLMClient
+from services.sse import SSEStreams, sse_event, SSE_BATCH_MS, SSE_BATCH_BYTES
+
+# =====================================
+# SSE DELIVERY BENCHMARK
+# =====================================
+# Streams the same fake-Ollama answers to concurrent clients three ways:
+#   raw       - one write per token, no framing (the original behaviour)
+#   per-token - one SSE event and one write per token
+#   batched   - SSEStream: tokens batched in a SSE_BATCH_MS / SSE_BATCH_BYTES
+#               window, events with ids
+# Writes are counted at the ASGI layer (each body message is one transport
+# write, i.e. roughly one send() syscall); bytes are what the client read
+# off the socket, HTTP chunk framing included.
+
+
+class WriteCounter:
+    # ASGI middleware counting response body messages per path
+    def __init__(self, app):
+        self.app = app
+        self.writes = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        mode = scope["path"].strip("/").split("/")[0]
+
+        async def counting_send(message):
+            if message["type"] == "http.response.body" and message.get("body"):
+                self.writes[mode] = self.writes.get(mode, 0) + 1
+            await send(message)
+
+        await self.app(scope, receive, counting_send)
+
+
+def build_app(client):
+    app = FastAPI()
+
+    @app.get("/raw/{n}")
+    async def raw(n: str):
+        async def body():
+            async for token in client.stream(f"question {n}"):
+                yield token
+        return StreamingResponse(body(), media_type="text/event-stream")
+
+    @app.get("/per-token/{n}")
+    async def per_token(n: str):
+        async def body():
+            async for token in client.stream(f"question {n}"):
+                yield sse_event(token)
+        return StreamingResponse(body(), media_type="text/event-stream")
+
+    @app.get("/batched/{n}")
+    async def batched(n: str, request: Request):
+        stream = SSEStreams.open(client.stream(f"question {n}"))
+        return StreamingResponse(stream.follow(request), media_type="text/event-stream")
+
+    return app
+
+
+def serve(app):
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, thread, sock.getsockname()[1]
+
+
+async def fetch(port, path):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    start = time.perf_counter()
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n\r\n".encode())
+    total, first_token = 0, None
+    while True:
+        data = await reader.read(65536)
+        if not data:
+            break
+        total += len(data)
+        if first_token is None and b"tok" in data:
+            first_token = time.perf_counter() - start
+    writer.close()
+    return total, first_token, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--answers", type=int, default=20, help="concurrent answers per mode")
+    parser.add_argument("--tokens", type=int, default=300)
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    args = parser.parse_args()
+
+    fake = FakeOllama(token_count=args.tokens, first_token_delay=0.02, token_delay=args.token_delay).start()
+    client = LLMClient(base_url=fake.base_url, model="fake")
+    app = WriteCounter(build_app(client))
+    server, thread, port = serve(app)
+
+    print(
+        f"{args.answers} concurrent answers x {args.tokens} tokens, "
+        f"{args.token_delay * 1000:.0f}ms/token, batch {SSE_BATCH_MS:.0f}ms / {SSE_BATCH_BYTES}B\n"
+    )
+    print(f"{'mode':<11}{'writes/answer':>14}{'bytes/answer':>14}{'first token':>13}{'total':>10}")
+    for mode in ("raw", "per-token", "batched"):
+        results = asyncio.run(_gather(port, mode, args.answers))
+        writes = app.writes.get(mode, 0) / args.answers
+        print(
+            f"{mode:<11}{writes:>14.1f}"
+            f"{statistics.mean(r[0] for r in results):>14.0f}"
+            f"{statistics.median(r[1] for r in results) * 1000:>11.1f}ms"
+            f"{statistics.median(r[2] for r in results):>9.2f}s"
+        )
+
+    server.should_exit = True
+    thread.join(timeout=5)
+    fake.stop()
+
+
+async def _gather(port, mode, answers):
+    return await asyncio.gather(*[fetch(port, f"/{mode}/{i}") for i in range(answers)])
+
+
+if __name__ == "__main__":
+    main()
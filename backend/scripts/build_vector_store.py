@@ -1,37 +1,25 @@
-import os
+import argparse
+import sys
 import time
 from pathlib import Path
-from langchain_community.vectorstores import FAISS
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from PyPDF2 import PdfReader
-import docx
 
 # =====================================
 # PROJECT ROOT (outside scripts folder)
 # =====================================
 
 BASE_DIR = Path(__file__).resolve().parent.parent  # project root
+sys.path.insert(0, str(BASE_DIR))
+
+from services.embedding_service import embedding_engine as embeddings_model
+from services.document_reader import SUPPORTED_EXTENSIONS, iter_blocks, iter_chunks
+from services.index_store import IndexStore
+from services.vector_index import VectorIndex, file_id_from_source
+from services import ann_index
 
 UPLOAD_DIR = BASE_DIR / "uploads"
-VECTOR_STORE_PATH = BASE_DIR / "vector_store"
-FAISS_INDEX_PATH = VECTOR_STORE_PATH / "faiss_index"
 
 UPLOAD_DIR.mkdir(exist_ok=True)
-VECTOR_STORE_PATH.mkdir(exist_ok=True)
-
-# =====================================
-# LOAD EMBEDDING MODEL
-# =====================================
-
-print("🔄 Loading embedding model...")
-start_time = time.time()
-
-embeddings_model = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-MiniLM-L6-v2"
-)
-
-print(f"✅ Embedding model loaded in {round(time.time() - start_time, 2)} sec\n")
 
 # =====================================
 # TEXT SPLITTER
@@ -42,116 +30,154 @@ text_splitter = RecursiveCharacterTextSplitter(
     chunk_overlap=50
 )
 
-# =====================================
-# LOAD EXISTING FAISS INDEX
-# =====================================
 
-vector_store = None
+# PDF extraction runs in a spawn-based process pool whose workers re-import
+# this file, so everything below must stay behind the __main__ guard
+def main():
 
-if (FAISS_INDEX_PATH / "index.faiss").exists():
-    print("📦 Loading existing FAISS index...")
-    vector_store = FAISS.load_local(
-        str(FAISS_INDEX_PATH),
-        embeddings_model,
-        allow_dangerous_deserialization=True
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--convert", choices=ann_index.INDEX_TYPES,
+        help="rebuild the current index as another index type and exit "
+             "(set INDEX_TYPE to match: later writes rebuild to INDEX_TYPE)"
     )
-    print("✅ Existing index loaded\n")
-else:
-    print("🆕 No existing index found. A new one will be created.\n")
+    args = parser.parse_args()
 
-# =====================================
-# GET LATEST FILE ONLY
-# =====================================
+    if args.convert:
+        convert_index(args.convert)
+        return
 
-files = [
-    f for f in UPLOAD_DIR.iterdir()
-    if f.is_file() and f.suffix.lower() in [".txt", ".pdf", ".docx"]
-]
+    # =====================================
+    # LOAD EMBEDDING MODEL
+    # =====================================
 
-if not files:
-    print("❌ No files found in uploads folder.")
-    exit()
+    print("🔄 Loading embedding model...")
+    start_time = time.time()
 
-latest_file = max(files, key=lambda f: f.stat().st_mtime)
+    embeddings_model.model  # shared engine loads lazily; force it here for timing
 
-print(f"📄 Latest file detected: {latest_file.name}")
+    print(f"✅ Embedding model loaded in {round(time.time() - start_time, 2)} sec\n")
 
-# =====================================
-# FILE READER
-# =====================================
+    # =====================================
+    # GET LATEST FILE ONLY
+    # =====================================
 
-def read_file(file_path):
-    text = ""
+    files = [
+        f for f in UPLOAD_DIR.iterdir()
+        if f.is_file() and f.suffix.lower() in SUPPORTED_EXTENSIONS
+    ]
 
-    if file_path.suffix.lower() == ".txt":
-        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-            text = f.read()
+    if not files:
+        print("❌ No files found in uploads folder.")
+        return
 
-    elif file_path.suffix.lower() == ".pdf":
-        reader = PdfReader(str(file_path))
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
+    latest_file = max(files, key=lambda f: f.stat().st_mtime)
 
-    elif file_path.suffix.lower() == ".docx":
-        doc = docx.Document(str(file_path))
-        for para in doc.paragraphs:
-            text += para.text + "\n"
+    print(f"📄 Latest file detected: {latest_file.name}")
 
-    return text
+    # =====================================
+    # PROCESS FILE
+    # =====================================
 
+    print("🔄 Reading & splitting file...")
+    chunks = [chunk for _, chunk in iter_chunks(iter_blocks(latest_file), text_splitter)]
 
-# =====================================
-# PROCESS FILE
-# =====================================
+    print(f"📊 Total chunks generated: {len(chunks)}")
 
-print("🔄 Reading file...")
-text = read_file(latest_file)
+    if len(chunks) == 0:
+        print("❌ File is empty or unreadable.")
+        return
 
-if not text.strip():
-    print("❌ File is empty or unreadable.")
-    exit()
+    # =====================================
+    # LOAD EXISTING FAISS INDEX
+    # =====================================
 
-print("✂️ Splitting into chunks...")
-chunks = text_splitter.split_text(text)
-total_chunks = len(chunks)
+    # Waits for a build running in the server (or another run of this
+    # script), then keeps it out until this snapshot is committed
+    with IndexStore.writing():
+        # Copied into a staging snapshot; the running server picks the result up
+        # from the pointer swap without ever seeing a half-written index
+        index_path = IndexStore.current_path()
+        staging = IndexStore.new_snapshot_dir()
 
-print(f"📊 Total chunks generated: {total_chunks}\n")
+        if index_path is not None:
+            print(f"\n📦 Loading existing FAISS index ({index_path.name})...")
+        else:
+            print("\n🆕 No existing index found. A new one will be created.")
+        vector_index = VectorIndex.open_for_update(index_path, staging)
 
-if total_chunks == 0:
-    print("❌ No chunks generated.")
-    exit()
+        # Skip chunks whose content hash is already in the index
+        file_id = file_id_from_source(latest_file.name)
+        hashes, chunks = vector_index.filter_new(chunks, file_id)
+        total_chunks = len(chunks)
 
-# =====================================
-# ADD TO FAISS WITH PROGRESS
-# =====================================
+        print(f"♻️ New chunks to embed: {total_chunks}\n")
 
-print("🧠 Generating embeddings & updating FAISS index...\n")
-start_time = time.time()
+        if total_chunks == 0 and not vector_index.changed:
+            vector_index.discard()
+            IndexStore.discard_staging(staging)
+            print("✅ Nothing new to embed. Index is up to date.")
+            return
 
-BATCH_SIZE = 32  # Improve speed
+        # =====================================
+        # ADD TO FAISS WITH PROGRESS
+        # =====================================
 
-for i in range(0, total_chunks, BATCH_SIZE):
-    batch = chunks[i:i + BATCH_SIZE]
+        print("🧠 Generating embeddings & updating FAISS index...\n")
+        start_time = time.time()
 
-    if vector_store is None:
-        vector_store = FAISS.from_texts(batch, embeddings_model)
-    else:
-        vector_store.add_texts(batch)
+        BATCH_SIZE = 32  # Improve speed
 
-    processed = min(i + BATCH_SIZE, total_chunks)
-    percent = round((processed / total_chunks) * 100, 2)
+        for i in range(0, total_chunks, BATCH_SIZE):
+            batch = chunks[i:i + BATCH_SIZE]
+            batch_hashes = hashes[i:i + BATCH_SIZE]
 
-    print(f"Progress: {processed}/{total_chunks} chunks ({percent}%)")
+            # New indexes use INDEX_TYPE; IVF types train on the first vectors
+            # and are retrained on save once the corpus has outgrown them
+            vectors = embeddings_model.embed_documents(batch)
+            vector_index.add(batch, vectors, batch_hashes, latest_file.name, file_id)
 
-# =====================================
-# SAVE FAISS INDEX
-# =====================================
+            processed = min(i + BATCH_SIZE, total_chunks)
+            percent = round((processed / total_chunks) * 100, 2)
+
+            print(f"Progress: {processed}/{total_chunks} chunks ({percent}%)")
+
+        # =====================================
+        # SAVE FAISS INDEX
+        # =====================================
+
+        print("\n💾 Saving FAISS index...")
+        vector_index.save()
+        snapshot = IndexStore.commit_snapshot(staging)
+
+    print(f"\n✅ Done!")
+    print(f"⏱ Total processing time: {round(time.time() - start_time, 2)} sec")
+    print(f"📂 Index published as snapshot: {snapshot}")
+
+
+def convert_index(index_type: str):
+    # Re-indexes the stored vectors under another index type; nothing is
+    # re-embedded and chunk ids stay the same
+    with IndexStore.writing():
+        index_path = IndexStore.current_path()
+        if index_path is None:
+            print("❌ No index to convert.")
+            return
+
+        staging = IndexStore.new_snapshot_dir()
+        vector_index = VectorIndex.open_for_update(index_path, staging)
+        print(f"🔄 Converting {ann_index.describe(vector_index.index)} "
+              f"({vector_index.ntotal} vectors) to {index_type}...")
+        start_time = time.time()
+
+        ids, vectors = ann_index.stored_vectors(vector_index.index)
+        vector_index.index = ann_index.build_index(ids, vectors, index_type)
+        vector_index.save()
+        snapshot = IndexStore.commit_snapshot(staging)
+
+    print(f"✅ Built {ann_index.describe(vector_index.index)} in {round(time.time() - start_time, 2)} sec")
+    print(f"📂 Index published as snapshot: {snapshot}")
 
-print("\n💾 Saving FAISS index...")
-vector_store.save_local(str(FAISS_INDEX_PATH))
 
-print(f"\n✅ Done!")
-print(f"⏱ Total processing time: {round(time.time() - start_time, 2)} sec")
-print(f"📂 Index saved at: {FAISS_INDEX_PATH}")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import json
+import os
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+BASE_DIR = Path(__file__).resolve().parent.parent  # project root
+sys.path.insert(0, str(BASE_DIR))
+
+# Throwaway SQLite file, answer cache on
+DB_PATH = Path(tempfile.gettempdir()) / f"chatbot_check_answer_{uuid.uuid4().hex[:8]}.sqlite"
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ["ANSWER_CACHE_ENABLED"] = "true"
+
+from database import Base, engine, AsyncSessionLocal
+from models import Thread, Message
+from routes.chat_route import router
+from services.answer_cache import answer_cache
+from services.index_store import IndexStore
+
+# =====================================
+# ANSWER PATHS CHECK
+# =====================================
+# Sends questions through /chat/send with the answer cache enabled while no
+# knowledge base exists (as before the first upload): every answer must be
+# the "not built yet" notice, streamed without an error event and saved as
+# a complete bot message, whether the prompt has thread history or not.
+# Exits non-zero on any failure.
+
+NOTICE = "Knowledge base not built yet. Please upload a document first."
+
+
+def no_knowledge_base():
+    # Loaded, nothing published; don't look at vector_store/ on disk
+    IndexStore._loaded = True
+    IndexStore._snapshot = None
+    IndexStore._next_check = float("inf")
+
+
+def ask(client, message, thread_id):
+    response = client.post("/chat/send", json={"message": message, "thread_id": thread_id})
+    events = []
+    for block in response.text.split("\n\n"):
+        event, data = "message", []
+        for line in block.split("\n"):
+            if line.startswith("event:"):
+                event = line[6:].strip()
+            elif line.startswith("data:"):
+                data.append(line[6:])
+        if data:
+            events.append((event, "\n".join(data)))
+    return response.status_code, events
+
+
+async def bot_messages(thread_id):
+    async with AsyncSessionLocal() as db:
+        result = await db.scalars(
+            select(Message)
+            .where(Message.thread_id == thread_id, Message.sender == "bot")
+            .order_by(Message.created_at)
+        )
+        return [(m.text, m.truncated) for m in result]
+
+
+def main():
+    Base.metadata.create_all(bind=engine, tables=[Thread.__table__, Message.__table__])
+    no_knowledge_base()
+
+    app = FastAPI()
+    app.include_router(router)
+    failures = 0
+
+    def check(name, ok, detail=""):
+        nonlocal failures
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {name}{f': {detail}' if detail and not ok else ''}")
+
+    cases = [
+        ("new thread, no history", "what does E-1003 mean", "check-a"),
+        ("same question, new thread", "what does E-1003 mean", "check-b"),
+        ("thread with history", "and E-1004?", "check-a"),
+    ]
+    try:
+        with TestClient(app) as client:
+            for name, message, thread_id in cases:
+                status, events = ask(client, message, thread_id)
+                errors = [json.loads(data) for event, data in events if event == "error"]
+                text = "".join(data for event, data in events if event == "message")
+                check(f"{name}: streamed", status == 200 and not errors and text == NOTICE,
+                      f"status={status} errors={errors} text={text!r}")
+
+                saved = client.portal.call(bot_messages, thread_id)
+                check(f"{name}: bot message saved", bool(saved) and saved[-1] == (NOTICE, False),
+                      f"saved={saved}")
+
+        # Nothing was retrieved, so there was nothing to key an entry on
+        stats = answer_cache.stats()
+        check("answer cache left empty", stats["size"] == 0, f"stats={stats}")
+    finally:
+        DB_PATH.unlink(missing_ok=True)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import asyncio
+import os
+import sys
+import tempfile
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import delete, func, select
+
+BASE_DIR = Path(__file__).resolve().parent.parent  # project root
+sys.path.insert(0, str(BASE_DIR))
+
+# Throwaway SQLite file unless DATABASE_URL points somewhere else
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{Path(tempfile.gettempdir()) / 'chatbot_check_db.sqlite'}"
+)
+
+from database import Base, engine, async_engine, AsyncSessionLocal
+from models import Thread, Message
+from services.chat_service import ChatService
+from services.index_store import IndexStore
+
+# =====================================
+# ASYNC DATABASE PATHS CHECK
+# =====================================
+# Runs the chat DB paths on AsyncSession against a real database:
+#   - thread creation and the user/bot messages of /chat/send
+#   - history order and limit/offset paging
+#   - the truncated flag round-trip through _save_reply
+#   - thread titles (latest message) and their order in get_all_threads
+# No knowledge base is loaded, so answers are the "not built yet" notice
+# and no LLM is needed. Check rows are deleted afterwards; exits non-zero
+# on any failure.
+
+PREFIX = "check-"
+BASE_TIME = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+failures = 0
+
+
+def check(name, ok, detail=""):
+    global failures
+    failures += not ok
+    print(f"{'✅' if ok else '❌'} {name}{f': {detail}' if detail and not ok else ''}")
+
+
+def no_knowledge_base():
+    # Loaded, nothing published; don't look at vector_store/ on disk
+    IndexStore._loaded = True
+    IndexStore._snapshot = None
+    IndexStore._next_check = float("inf")
+
+
+async def cleanup():
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(Message).where(Message.thread_id.startswith(PREFIX)))
+        await db.execute(delete(Thread).where(Thread.id.startswith(PREFIX)))
+        await db.commit()
+
+
+async def seed(thread_id, texts, start):
+    # Explicit, distinct timestamps: SQLite's now() only has second precision
+    async with AsyncSessionLocal() as db:
+        db.add(Thread(id=thread_id))
+        for i, text in enumerate(texts):
+            db.add(Message(
+                id=str(uuid.uuid4()),
+                thread_id=thread_id,
+                sender="user" if i % 2 == 0 else "bot",
+                text=text,
+                created_at=start + timedelta(seconds=i),
+            ))
+        await db.commit()
+
+
+async def send(message, thread_id):
+    # /chat/send without the HTTP layer; reads the stream to the end
+    response = await ChatService.generate_stream(message, thread_id)
+    body = b""
+    async for chunk in response.body_iterator:
+        body += chunk if isinstance(chunk, bytes) else chunk.encode()
+    return body.decode()
+
+
+async def check_thread_creation():
+    thread_id = f"{PREFIX}new"
+    await send("first question", thread_id)
+    await send("second question", thread_id)
+
+    async with AsyncSessionLocal() as db:
+        threads = await db.scalar(select(func.count(Thread.id)).where(Thread.id == thread_id))
+        messages = (await db.scalars(select(Message).where(Message.thread_id == thread_id))).all()
+
+    check("thread created once", threads == 1, f"threads={threads}")
+    users = sorted(m.text for m in messages if m.sender == "user")
+    bots = [m for m in messages if m.sender == "bot"]
+    check("user messages saved", users == ["first question", "second question"], f"users={users}")
+    check(
+        "bot answers saved",
+        len(bots) == 2 and all(m.text.startswith("Knowledge base not built yet") and not m.truncated for m in bots),
+        f"bots={[(m.text, m.truncated) for m in bots]}",
+    )
+
+
+async def check_history_paging():
+    thread_id = f"{PREFIX}paging"
+    texts = [f"message {i}" for i in range(7)]
+    await seed(thread_id, texts, BASE_TIME)
+
+    history = await ChatService.get_chat_history(thread_id)
+    check("history in order", [m["text"] for m in history] == texts, f"history={history}")
+    check(
+        "history senders",
+        [m["sender"] for m in history] == ["user" if i % 2 == 0 else "bot" for i in range(7)],
+    )
+
+    pages = [await ChatService.get_chat_history(thread_id, limit=3, offset=offset) for offset in (0, 3, 6, 9)]
+    shown = [[m["text"] for m in page] for page in pages]
+    check("history pages", shown == [texts[0:3], texts[3:6], texts[6:7], []], f"pages={shown}")
+
+
+async def check_truncated_round_trip():
+    thread_id = f"{PREFIX}truncated"
+    await seed(thread_id, [], BASE_TIME)
+    await ChatService._save_reply(thread_id, "complete answer", False)
+    await ChatService._save_reply(thread_id, "cut short", True)
+
+    flags = {m["text"]: m["truncated"] for m in await ChatService.get_chat_history(thread_id)}
+    check(
+        "truncated flag round-trip",
+        flags == {"complete answer": False, "cut short": True},
+        f"flags={flags}",
+    )
+
+
+async def check_thread_titles():
+    # Latest message is the title; most recently active thread first
+    await seed(f"{PREFIX}older", ["older question", "older answer"], BASE_TIME + timedelta(hours=1))
+    await seed(f"{PREFIX}newer", ["newer question", "newer answer", "newer follow-up"], BASE_TIME + timedelta(hours=2))
+
+    async with AsyncSessionLocal() as db:
+        threads = await ChatService.get_all_threads(db)
+    seeded = [t for t in threads if t["id"] in (f"{PREFIX}older", f"{PREFIX}newer")]
+    check(
+        "thread titles",
+        seeded == [
+            {"id": f"{PREFIX}newer", "title": "newer follow-up"},
+            {"id": f"{PREFIX}older", "title": "older answer"},
+        ],
+        f"threads={seeded}",
+    )
+
+
+async def run():
+    await cleanup()
+    try:
+        await check_thread_creation()
+        await check_history_paging()
+        await check_truncated_round_trip()
+        await check_thread_titles()
+    finally:
+        await cleanup()
+        await async_engine.dispose()
+
+
+def main():
+    Base.metadata.create_all(bind=engine, tables=[Thread.__table__, Message.__table__])
+    no_knowledge_base()
+    print(f"{async_engine.dialect.name} ({async_engine.dialect.driver})\n")
+
+    asyncio.run(run())
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
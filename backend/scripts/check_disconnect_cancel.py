@@ -0,0 +1,204 @@
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fake_ollama import FakeOllama
+
+BASE_DIR = Path(__file__).resolve().parent.parent  # project root
+sys.path.insert(0, str(BASE_DIR))
+
+# One generation slot, so a second request has to queue
+os.environ["LLM_CONCURRENCY"] = "1"
+
+from services.llm_client import LLMClient
+from services.llm_scheduler import LLMScheduler
+from services.single_flight import SingleFlight
+from services.sse import SSEStreams, sse_headers, SSE_DISCONNECT_CHECK, SSE_RESUME_GRACE
+
+# =====================================
+# CLIENT DISCONNECT -> UPSTREAM CANCELLATION CHECK
+# =====================================
+# Serves a streaming endpoint built from the same pieces as /chat/send
+# (scheduler, single-flight, pooled LLM client, SSE stream) against a
+# slow fake Ollama, drops clients mid-answer and measures how long it takes
+# until the upstream stream is aborted and the scheduler slot is free again,
+# then resumes a stopped stream to see it marked truncated.
+# Exits non-zero when a release exceeds the bound or the mark is missing.
+
+
+def build_app(client):
+    app = FastAPI()
+
+    @app.get("/ask/{question}")
+    async def ask(question: str, request: Request):
+        async def answer():
+            generation, _ = SingleFlight.join(
+                SingleFlight.key(question, 0),
+                lambda: LLMScheduler.schedule(question, lambda: client.stream(question)),
+            )
+            tokens = generation.follow()
+            try:
+                async for token in tokens:
+                    yield token
+            finally:
+                tokens.close()
+
+        stream = SSEStreams.open(answer())
+        return StreamingResponse(
+            stream.follow(request), media_type="text/event-stream", headers=sse_headers(stream)
+        )
+
+    @app.get("/resume/{stream_id}")
+    async def resume(stream_id: str, request: Request):
+        stream = SSEStreams.get(stream_id)
+        return StreamingResponse(stream.follow(request), media_type="text/event-stream")
+
+    return app
+
+
+def serve(app):
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, thread, f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+class Reader:
+    # Streams one question over a raw socket in a thread; stop() drops the
+    # connection even while nothing is being received
+    def __init__(self, url):
+        self.events = 0
+        self.received = b""
+        host, port = url.split("//")[1].split("/")[0].split(":")
+        path = "/" + url.split("//")[1].split("/", 1)[1]
+        self._sock = socket.create_connection((host, int(port)))
+        self._sock.sendall(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            while True:
+                data = self._sock.recv(65536)
+                if not data:
+                    break
+                self.received += data
+                self.events += data.count(b"data:")
+        except OSError:
+            pass
+
+    def wait_for(self, events, timeout=10):
+        deadline = time.monotonic() + timeout
+        while self.events < events and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def stop(self):
+        self._sock.shutdown(socket.SHUT_RDWR)
+        self._sock.close()
+        self._thread.join(timeout=5)
+
+
+def wait_until(condition, timeout):
+    start = time.monotonic()
+    while not condition():
+        if time.monotonic() - start > timeout:
+            return None
+        time.sleep(0.005)
+    return time.monotonic() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--token-delay", type=float, default=0.1, help="slow fake LLM: seconds per token")
+    parser.add_argument("--bound", type=float, default=SSE_DISCONNECT_CHECK + SSE_RESUME_GRACE + 1.0,
+                        help="max seconds to release")
+    args = parser.parse_args()
+
+    fake = FakeOllama(token_count=1000, first_token_delay=0.05, token_delay=args.token_delay).start()
+    client = LLMClient(base_url=fake.base_url, model="fake")
+    server, thread, url = serve(build_app(client))
+    failures = 0
+
+    def report(name, elapsed):
+        nonlocal failures
+        ok = elapsed is not None and elapsed <= args.bound
+        failures += not ok
+        shown = f"{elapsed * 1000:.0f}ms" if elapsed is not None else "never"
+        print(f"{'✅' if ok else '❌'} {name}: released after {shown} (bound {args.bound * 1000:.0f}ms)")
+
+    # 1. Only listener leaves mid-answer: upstream aborted, slot freed
+    reader = Reader(f"{url}/ask/alpha")
+    reader.wait_for(5)
+    aborted = fake.aborted_streams
+    reader.stop()
+    report(
+        "single client",
+        wait_until(lambda: fake.aborted_streams > aborted and LLMScheduler._active == 0, args.bound * 3),
+    )
+
+    # 2. Two clients share one generation: it survives the first leaving and
+    # stops when the second leaves
+    first, second = Reader(f"{url}/ask/beta"), None
+    first.wait_for(3)
+    second = Reader(f"{url}/ask/beta")
+    second.wait_for(3)
+    aborted = fake.aborted_streams
+    first.stop()
+    time.sleep(args.bound)
+    still_running = fake.aborted_streams == aborted and fake.active_streams == 1
+    print(f"{'✅' if still_running else '❌'} coalesced: generation kept for the remaining client")
+    failures += not still_running
+    second.stop()
+    report(
+        "coalesced, last client",
+        wait_until(lambda: fake.aborted_streams > aborted and LLMScheduler._active == 0, args.bound * 3),
+    )
+
+    # 3. Client leaves while queued behind another generation
+    holder = Reader(f"{url}/ask/gamma")
+    holder.wait_for(2)
+    queued = Reader(f"{url}/ask/delta")
+    if wait_until(lambda: LLMScheduler._waiting == 1, 5) is None:
+        print("❌ queued client: never queued")
+        failures += 1
+    queued.stop()
+    report("queued client", wait_until(lambda: LLMScheduler._waiting == 0, args.bound * 3))
+    holder.stop()
+    wait_until(lambda: LLMScheduler._active == 0, args.bound * 3)
+
+    # 4. Resume after the generation was stopped: the replay ends with a
+    # "done" event that marks the answer as cut short
+    reader = Reader(f"{url}/ask/epsilon")
+    reader.wait_for(3)
+    reader.stop()
+    wait_until(lambda: LLMScheduler._active == 0, args.bound * 3)
+    headers = reader.received.split(b"\r\n\r\n", 1)[0].decode().lower().split("\r\n")
+    stream_id = next(h.split(":", 1)[1].strip() for h in headers if h.startswith("x-stream-id:"))
+    replay = httpx.get(f"{url}/resume/{stream_id}", timeout=10).text
+    last = replay.rstrip().split("\n\n")[-1]
+    marked = "event: done" in last and json.loads(last.split("data: ", 1)[1])["truncated"] is True
+    print(f"{'✅' if marked else '❌'} resumed after the stop: replay ends with done truncated=true")
+    failures += not marked
+
+    print(f"\nupstream requests={fake.requests} aborted={fake.aborted_streams} completed={fake.completed_streams}")
+    server.should_exit = True
+    thread.join(timeout=5)
+    fake.stop()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
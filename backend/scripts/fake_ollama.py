@@ -0,0 +1,211 @@
+import asyncio
+import json
+import threading
+import time
+
+# =====================================
+# MINIMAL OLLAMA-COMPATIBLE HTTP SERVER
+# =====================================
+# Streams NDJSON from /api/chat and /api/generate the way `ollama serve`
+# does, with configurable delays, so benchmarks can run without a model.
+# The model is "resident" for keep_alive seconds after each request (5
+# minutes unless the request says otherwise, like Ollama); a request that
+# finds it unloaded waits load_delay first. Runs on its own event loop in a
+# background thread.
+
+_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_keep_alive(value, default):
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        return float("inf") if value < 0 else float(value)
+    for unit in ("ms", "s", "m", "h"):
+        if value.endswith(unit):
+            return float(value[:-len(unit)]) * _UNITS[unit]
+    return parse_keep_alive(float(value), default)
+
+
+class FakeOllama:
+
+    def __init__(self, token_count=50, first_token_delay=0.05, token_delay=0.01, port=0,
+                 load_delay=0.0, default_keep_alive=300.0):
+        self.token_count = token_count
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.port = port
+        self.load_delay = load_delay
+        self.default_keep_alive = default_keep_alive
+
+        self.connections = 0
+        self.requests = 0
+        self.model_loads = 0
+        self._resident_until = 0.0
+        self._loading = None
+        self.active_streams = 0
+        self.completed_streams = 0
+        self.aborted_streams = 0
+
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(timeout=5)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+    async def _shutdown(self):
+        # Close idle keep-alive connections too, not just the listener
+        self._server.close()
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, "127.0.0.1", self.port)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            # Keep-alive: serve requests on this connection until it closes
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                method, path, _ = request_line.decode().split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode().partition(":")
+                    headers[key.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                body = json.loads(await reader.readexactly(length)) if length else {}
+                self.requests += 1
+
+                if not await self._respond(writer, method, path.rstrip("/"), body):
+                    break
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, method, path, body):
+        if path not in ("/api/chat", "/api/generate"):
+            payload = json.dumps({"status": "ok"}).encode()
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                + f"Content-Length: {len(payload)}\r\n\r\n".encode()
+                + payload
+            )
+            await writer.drain()
+            return True
+
+        await self._ensure_loaded(body.get("keep_alive"))
+
+        # A prompt-less generate or message-less chat only loads the model
+        tokens = self.token_count
+        if path == "/api/generate" and not body.get("prompt"):
+            tokens = 0
+        if path == "/api/chat" and not body.get("messages"):
+            tokens = 0
+
+        if body.get("stream") is False:
+            await asyncio.sleep(self.first_token_delay if tokens else 0)
+            await asyncio.sleep(self.token_delay * tokens)
+            payload = self._line(path, "".join(f"tok{i} " for i in range(tokens)), True)
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                + f"Content-Length: {len(payload)}\r\n\r\n".encode()
+                + payload
+            )
+            await writer.drain()
+            self.completed_streams += 1
+            return True
+
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: application/x-ndjson\r\n"
+            b"Transfer-Encoding: chunked\r\n\r\n"
+        )
+
+        self.active_streams += 1
+        try:
+            await asyncio.sleep(self.first_token_delay if tokens else 0)
+            for i in range(tokens):
+                await self._write_line(writer, self._line(path, f"tok{i} ", False))
+                await asyncio.sleep(self.token_delay)
+            await self._write_line(writer, self._line(path, "", True))
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+            self.completed_streams += 1
+            return True
+        except ConnectionError:
+            self.aborted_streams += 1
+            return False
+        finally:
+            self.active_streams -= 1
+
+    async def _ensure_loaded(self, keep_alive):
+        # Concurrent requests for an unloaded model wait on a single load
+        if self._loading is None and time.monotonic() >= self._resident_until:
+            self.model_loads += 1
+            self._loading = asyncio.ensure_future(asyncio.sleep(self.load_delay))
+        if self._loading is not None:
+            await asyncio.shield(self._loading)
+            self._loading = None
+        self._resident_until = time.monotonic() + parse_keep_alive(keep_alive, self.default_keep_alive)
+
+    @staticmethod
+    def _line(path, content, done):
+        if path == "/api/chat":
+            data = {"model": "fake", "message": {"role": "assistant", "content": content}, "done": done}
+        else:
+            data = {"model": "fake", "response": content, "done": done}
+        if done:
+            data["done_reason"] = "stop"
+        return json.dumps(data).encode() + b"\n"
+
+    @staticmethod
+    async def _write_line(writer, data):
+        if writer.is_closing():
+            raise ConnectionError("client went away")
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        await writer.drain()
+
+
+if __name__ == "__main__":
+    server = FakeOllama(port=11435).start()
+    print(f"Fake Ollama listening on {server.base_url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
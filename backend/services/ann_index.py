@@ -0,0 +1,162 @@
+import math
+import os
+import faiss
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# flat | ivf_flat | ivf_pq | hnsw
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")
+IVF_NLIST = int(os.getenv("IVF_NLIST", 1024))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", 16))
+PQ_M = int(os.getenv("PQ_M", 16))  # sub-quantizers; must divide the vector size
+PQ_NBITS = int(os.getenv("PQ_NBITS", 8))
+HNSW_M = int(os.getenv("HNSW_M", 32))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", 200))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", 64))
+# Vectors buffered to train IVF / PQ before the first insert
+ANN_TRAIN_SAMPLE = int(os.getenv("ANN_TRAIN_SAMPLE", 50000))
+# An IVF index is retrained once the corpus calls for this many times the
+# lists it was trained with (lists grow with sqrt(N): 2 = corpus grew ~4x)
+ANN_RETRAIN_GROWTH = float(os.getenv("ANN_RETRAIN_GROWTH", 2))
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+_CLASS_NAMES = {
+    "flat": "IndexFlatL2",
+    "ivf_flat": "IndexIVFFlat",
+    "ivf_pq": "IndexIVFPQ",
+    "hnsw": "IndexHNSWFlat",
+}
+
+
+def needs_training(index_type: str = INDEX_TYPE) -> bool:
+    return index_type in ("ivf_flat", "ivf_pq")
+
+
+def _nlist_for(n: int, n_train: int = None) -> int:
+    # ~4*sqrt(N) lists, capped by config, with enough training points per list
+    n_train = n if n_train is None else n_train
+    return max(1, min(IVF_NLIST, int(4 * math.sqrt(n)), n_train // 39))
+
+
+def planned_type(n_train: int, index_type: str = INDEX_TYPE) -> str:
+    # The type create_index() actually builds with n_train training vectors
+    if needs_training(index_type):
+        # PQ codebooks want ~39 points per centroid (2^nbits of them)
+        if index_type == "ivf_pq" and n_train < 39 * 2 ** PQ_NBITS:
+            index_type = "ivf_flat"
+        if n_train < 39:
+            return "flat"
+    return index_type
+
+
+def create_index(dim: int, index_type: str = INDEX_TYPE, training_vectors=None, ntotal: int = None):
+    n = 0 if training_vectors is None else len(training_vectors)
+    planned = planned_type(n, index_type)
+    if planned != index_type:
+        print(f"Only {n} vectors to train {index_type}; using {planned} instead")
+
+    if planned == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        return index
+
+    if needs_training(planned):
+        # Lists sized for the whole corpus, as far as the sample can train
+        nlist = _nlist_for(n if ntotal is None else ntotal, n)
+        quantizer = faiss.IndexFlatL2(dim)
+        if planned == "ivf_pq":
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, PQ_M, PQ_NBITS)
+        else:
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        index.train(np.ascontiguousarray(training_vectors, dtype=np.float32))
+        apply_search_params(index)
+        return index
+
+    return faiss.IndexFlatL2(dim)
+
+
+def needs_rebuild(index, index_type: str = INDEX_TYPE) -> bool:
+    # The live index no longer is what build_index() would make for its
+    # size: another type than configured (INDEX_TYPE changed, or a fallback
+    # forced by a small first corpus) or IVF lists trained for a much
+    # smaller corpus
+    n = index.ntotal
+    planned = planned_type(min(n, ANN_TRAIN_SAMPLE), index_type)
+    if describe(index) != _CLASS_NAMES[planned]:
+        return True
+    ivf = faiss.try_extract_index_ivf(index)
+    return ivf is not None and _nlist_for(n, min(n, ANN_TRAIN_SAMPLE)) >= ANN_RETRAIN_GROWTH * ivf.nlist
+
+
+def apply_search_params(index, nprobe: int = IVF_NPROBE, ef_search: int = HNSW_EF_SEARCH):
+    # Query-time accuracy/latency knobs; wrappers (IDMap etc.) are unwrapped
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+
+    hnsw = _hnsw(index)
+    if hnsw is not None:
+        hnsw.hnsw.efSearch = ef_search
+    return index
+
+
+def _hnsw(index):
+    inner = index
+    while inner is not None:
+        inner = faiss.downcast_index(inner)
+        if isinstance(inner, faiss.IndexHNSW):
+            return inner
+        inner = getattr(inner, "index", None)
+    return None
+
+
+def search_parameters(index, selector):
+    # Per-query id filter, keeping the index's own nprobe / efSearch
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+    hnsw = _hnsw(index)
+    if hnsw is not None:
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=hnsw.hnsw.efSearch)
+    return faiss.SearchParameters(sel=selector)
+
+
+def supports_remove(index) -> bool:
+    # HNSW graphs cannot drop nodes; removed ids are filtered at search time
+    return _hnsw(index) is None
+
+
+def describe(index) -> str:
+    inner = faiss.downcast_index(index)
+    if hasattr(inner, "id_map"):
+        inner = faiss.downcast_index(inner.index)
+    return type(inner).__name__
+
+
+def stored_vectors(index):
+    # (ids, vectors) of every entry, unwrapping an IDMap. PQ indexes only
+    # reconstruct approximations of the original vectors.
+    inner = faiss.downcast_index(index)
+    if hasattr(inner, "id_map"):
+        ids = faiss.vector_to_array(inner.id_map).astype(np.int64)
+        inner = faiss.downcast_index(inner.index)
+    else:
+        ids = np.arange(inner.ntotal, dtype=np.int64)
+
+    ivf = faiss.try_extract_index_ivf(inner)
+    if ivf is not None:
+        ivf.make_direct_map()
+    return ids, inner.reconstruct_n(0, inner.ntotal)
+
+
+def build_index(ids, vectors, index_type: str = INDEX_TYPE):
+    # Vectors are keyed by chunk id so the index type can change without
+    # renumbering the chunk table
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index = faiss.IndexIDMap2(
+        create_index(vectors.shape[1], index_type, vectors[:ANN_TRAIN_SAMPLE], len(vectors))
+    )
+    index.add_with_ids(vectors, np.asarray(ids, dtype=np.int64))
+    return index
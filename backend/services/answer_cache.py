@@ -0,0 +1,107 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+import numpy as np
+from services.index_store import IndexStore
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Opt-in: replaying a stored answer for a paraphrased question is only safe
+# when the knowledge base is stable, so it is off unless enabled
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "false").lower() == "true"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.92))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", 512))
+ANSWER_CACHE_CANDIDATES = 8
+
+
+class SemanticAnswerCache:
+    # Question vectors live in a small inner-product FAISS index over
+    # L2-normalized vectors, so scores are cosine similarities. An entry only
+    # matches when the retrieved context (chunk ids) is identical too.
+
+    def __init__(self, max_size: int, threshold: float):
+        self.max_size = max_size
+        self.threshold = threshold
+        self._index = None
+        self._entries = OrderedDict()  # faiss id -> (context_key, answer)
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _prepare(vector):
+        import faiss
+
+        query = np.array([vector], dtype=np.float32)
+        faiss.normalize_L2(query)
+        return query
+
+    def lookup(self, vector, context_key: str) -> Optional[str]:
+        with self._lock:
+            if self._index is None or self._index.ntotal == 0:
+                self.misses += 1
+                return None
+
+            k = min(ANSWER_CACHE_CANDIDATES, self._index.ntotal)
+            scores, ids = self._index.search(self._prepare(vector), k)
+
+            for score, entry_id in zip(scores[0], ids[0]):
+                if entry_id == -1 or score < self.threshold:
+                    break
+                entry = self._entries.get(int(entry_id))
+                if entry and entry[0] == context_key:
+                    self._entries.move_to_end(int(entry_id))
+                    self.hits += 1
+                    return entry[1]
+
+            self.misses += 1
+            return None
+
+    def store(self, vector, context_key: str, answer: str):
+        import faiss
+
+        if self.max_size <= 0 or not answer.strip():
+            return
+
+        with self._lock:
+            query = self._prepare(vector)
+            if self._index is None:
+                self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(query.shape[1]))
+
+            entry_id = self._next_id
+            self._next_id += 1
+            self._index.add_with_ids(query, np.array([entry_id], dtype=np.int64))
+            self._entries[entry_id] = (context_key, answer)
+
+            while len(self._entries) > self.max_size:
+                old_id, _ = self._entries.popitem(last=False)
+                self._index.remove_ids(np.array([old_id], dtype=np.int64))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._index is not None:
+                self._index.reset()
+
+    def stats(self):
+        return {
+            "enabled": ANSWER_CACHE_ENABLED,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+answer_cache = SemanticAnswerCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_THRESHOLD)
+
+# Answers are only valid for the knowledge base they were generated from
+IndexStore.on_publish(lambda snapshot: answer_cache.clear())
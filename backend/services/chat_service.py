@@ -1,53 +1,120 @@
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_community.chat_models import ChatOllama
-from pathlib import Path
+import asyncio
 import google.generativeai as genai
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import delete, func, select
 from models import Thread, Message
-from database import SessionLocal
+from database import AsyncSessionLocal
+from services.retrieval_service import RetrievalService
+from services.embedding_service import embedding_engine
+from services.answer_cache import answer_cache, ANSWER_CACHE_ENABLED
+from services.rerank_service import RerankService, RERANK_ENABLED, RERANK_CANDIDATES
+from services.context_builder import ContextBuilder, CONTEXT_CANDIDATES, token_counter
+from services.conversation_memory import ConversationMemory
+from services.llm_client import llm_client
+from services.single_flight import SingleFlight, SINGLE_FLIGHT_ENABLED
+from services.llm_scheduler import LLMScheduler, QueueFull
+from services.sse import SSEStreams, sse_headers
 from typing import List, Optional
 import uuid
 import os
+import re
 
-# Embedding model
-embeddings = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-MiniLM-L6-v2"
-)
+# STRICT RAG PROMPT (no indentation: every space is a prefill token)
+PROMPT_TEMPLATE = """You are a document-based assistant.
+Use ONLY the information provided in the context.
+If the answer is not found in the context,
+reply strictly: "I don't know based on the provided document."
 
-# Vector store path
-VECTOR_STORE_PATH = Path("vector_store/faiss_index")
+{history}Context:
+{context}
 
+Question:
+{question}"""
 
-def get_vector_store():
-    index_path = VECTOR_STORE_PATH / "index.faiss"
+# Chunks the prompt carried before context assembly
+LEGACY_TOP_K = 3
 
-    # Check if index file exists
-    if not index_path.exists():
-        return None
 
-    return FAISS.load_local(
-        str(VECTOR_STORE_PATH),
-        embeddings,
-        allow_dangerous_deserialization=True
+def legacy_prompt(docs, message: str) -> str:
+    # The prompt exactly as it used to be sent (indented f-string, top
+    # chunks joined by newlines); only counted, as the baseline for
+    # prompt_tokens_saved
+    retrieved_text = "\n".join(
+        [doc.page_content for doc in docs[:LEGACY_TOP_K]]
     )
+    return f"""
+                        You are a document-based assistant.
+                        Use ONLY the information provided in the context.
+                        If the answer is not found in the context,
+                        reply strictly: "I don't know based on the provided document."
+
+                        Context:
+                        {retrieved_text}
+
+                        Question:
+                        {message}
+                        """
+
+
+async def replay_answer(answer: str):
+    # Cached answers go out word by word, like a live generation
+    for piece in re.findall(r"\s*\S+", answer):
+        yield piece
+
+
+class PreparedAnswer:
+    # Everything worked out before the LLM is needed: retrieval, prompt and
+    # answer cache lookup. retrieval is None when no knowledge base exists.
+    def __init__(self, history: str):
+        # Cache entries are keyed on question and context only, so they are
+        # only valid for prompts without thread history
+        self.use_cache = ANSWER_CACHE_ENABLED and not history
+        self.retrieval = None
+        self.prompt = None
+        self.prompt_tokens = 0
+        self.prompt_tokens_saved = 0
+        self.cached_answer = None
+
+    @property
+    def flight_key(self) -> str:
+        return SingleFlight.key(self.prompt, self.retrieval.generation)
+
+    def needs_generation(self) -> bool:
+        # False when it can be answered without a scheduler slot: the no-KB
+        # notice, a cached answer or an identical generation to follow
+        if self.retrieval is None or self.cached_answer is not None:
+            return False
+        return not (SINGLE_FLIGHT_ENABLED and SingleFlight.running(self.flight_key))
 
 
 class ChatService:
     @staticmethod
-    async def generate_stream(message: str, thread_id: str):
-        db: Session = SessionLocal()
+    async def generate_stream(message: str, thread_id: str, file_ids: Optional[List[str]] = None, request=None):
+        async with AsyncSessionLocal() as db:
+            thread = await db.scalar(select(Thread).where(Thread.id == thread_id))
+            new_thread = thread is None
+            if new_thread:
+                thread = Thread(id=thread_id)
 
-        try:
+            # Summary + recent turns, read before this question is stored
+            history = await ConversationMemory.load(db, thread)
+
+        # No free slot and no room to queue: work out whether this request
+        # needs a new generation before anything is stored. Cache hits,
+        # followers and the no-KB notice are still answered, the rest get
+        # 429 + Retry-After (raised as QueueFull).
+        prepared = None
+        if LLMScheduler.saturated():
+            prepared = await ChatService._prepare(message, file_ids, history)
+            if prepared.needs_generation():
+                LLMScheduler.check()
+
+        async with AsyncSessionLocal() as db:
             # Ensure thread exists
-            thread = db.query(Thread).filter(Thread.id == thread_id).first()
-            if not thread:
-                thread = Thread(id=thread_id)
+            if new_thread:
                 db.add(thread)
-                db.commit()
-                db.refresh(thread)
 
             # Save user message
             user_msg = Message(
@@ -57,88 +124,220 @@ class ChatService:
                 text=message
             )
             db.add(user_msg)
-            db.commit()
+            await db.commit()
 
-            # Retrieve relevant chunks
-            
-            vector_store = get_vector_store()
-            if not vector_store:
-                return "Knowledge base not built yet. Please upload a document first."
-            relevant_docs = vector_store.similarity_search(message, k=3)
+        # Retrieval and generation run in the stream's producer task, so the
+        # response (and heartbeats) start right away and the answer survives
+        # a reconnect (Last-Event-ID, see resume_stream)
+        stream = SSEStreams.open(
+            ChatService._answer(message, thread_id, file_ids, history, user_msg.id, prepared)
+        )
+        return StreamingResponse(
+            stream.follow(request),
+            media_type="text/event-stream",
+            headers=sse_headers(stream),
+        )
 
-            retrieved_text = "\n".join(
-                [doc.page_content for doc in relevant_docs]
-            )
+    @staticmethod
+    async def resume_stream(stream_id: str, last_event_id: int = 0, request=None):
+        # Events after Last-Event-ID, then live ones if still generating
+        stream = SSEStreams.get(stream_id)
+        if stream is None:
+            return None
+        return StreamingResponse(
+            stream.follow(request, last_event_id),
+            media_type="text/event-stream",
+            headers=sse_headers(stream),
+        )
 
-            # STRICT RAG PROMPT
-            prompt = f"""
-                        You are a document-based assistant.
-                        Use ONLY the information provided in the context.
-                        If the answer is not found in the context,
-                        reply strictly: "I don't know based on the provided document."
+    @staticmethod
+    async def _prepare(message: str, file_ids, history: str) -> PreparedAnswer:
+        prepared = PreparedAnswer(history)
 
-                        Context:
-                        {retrieved_text}
+        # Embedding + FAISS search are CPU bound; keep them off the event loop
+        retrieval = await run_in_threadpool(
+            RetrievalService.retrieve, message,
+            RERANK_CANDIDATES if RERANK_ENABLED else CONTEXT_CANDIDATES, file_ids
+        )
+        if retrieval is None:
+            return prepared
 
-                        Question:
-                        {message}
-                        """
+        # The chunks the old prompt would have used, before reranking
+        legacy_docs = retrieval.docs[:LEGACY_TOP_K]
+
+        # Cross-encoder orders the wider candidate set
+        if RERANK_ENABLED:
+            docs = await RerankService.rerank(message, retrieval.docs, CONTEXT_CANDIDATES)
+            retrieval = retrieval.with_docs(docs)
+
+        # Assembly and token counting are CPU bound as well
+        prompt, prompt_tokens, naive_tokens, compact_tokens = await run_in_threadpool(
+            ChatService._build_prompt, message, history, retrieval.docs, legacy_docs
+        )
+        ContextBuilder.record(naive_tokens, compact_tokens)
+
+        prepared.retrieval = retrieval
+        prepared.prompt = prompt
+        prepared.prompt_tokens = prompt_tokens
+        prepared.prompt_tokens_saved = naive_tokens - compact_tokens
+
+        # Near-duplicate question over the same context: skip the LLM
+        if prepared.use_cache:
+            prepared.cached_answer = answer_cache.lookup(retrieval.vector, retrieval.context_key)
+        return prepared
+
+    @staticmethod
+    async def _answer(message: str, thread_id: str, file_ids, history: str, user_msg_id: str,
+                      prepared: Optional[PreparedAnswer] = None):
+        # Yields answer tokens (str) and (event, payload) tuples; the bot
+        # message is saved at the end, marked truncated when the stream was
+        # cancelled before the answer was complete
+        reply = []
+        tokens = None
+        leader = True
+        truncated = True
+
+        try:
+            # Retrieve relevant chunks and build the prompt, unless that was
+            # already done to decide admission
+            if prepared is None:
+                prepared = await ChatService._prepare(message, file_ids, history)
+            retrieval = prepared.retrieval
+
+            if retrieval is None:
+                reply.append("Knowledge base not built yet. Please upload a document first.")
+                yield reply[0]
+                truncated = False
+                return
+
+            yield "meta", {"prompt_tokens": prepared.prompt_tokens, "prompt_tokens_saved": prepared.prompt_tokens_saved}
+
+            ticket = None
+            if prepared.cached_answer is not None:
+                tokens = replay_answer(prepared.cached_answer)
+            else:
+                # Same prompt already generating: follow that stream instead.
+                # Otherwise wait for a scheduler slot, then stream from the
+                # shared pooled client.
+                try:
+                    generation, leader = SingleFlight.join(
+                        prepared.flight_key,
+                        lambda: LLMScheduler.schedule(thread_id, lambda: llm_client.stream(prepared.prompt)),
+                        share=SINGLE_FLIGHT_ENABLED,
+                    )
+                except QueueFull as e:
+                    # Filled up after the request was accepted: take the
+                    # question back out so it is not left without an answer
+                    await asyncio.shield(ChatService._discard_question(user_msg_id))
+                    yield "error", {"status": 429, "retry_after": e.retry_after}
+                    return
+                tokens, ticket = generation.follow(), generation.ticket
+
+            # Place in line while the generation waits for a slot
+            if ticket is not None:
+                async for position in LLMScheduler.positions(ticket):
+                    yield "queue", {"position": position}
+
+            # Async token source: other requests keep running between tokens
+            async for token in tokens:
+                reply.append(token)
+                yield token
+            truncated = False
 
-            # Initialize Ollama
-            llm = ChatOllama(
-                model="llama3",  # or mistral
-                temperature=0.2,
-                streaming=True
+        except Exception as e:
+            print("Error:", str(e))
+            yield "error", {"status": 500, "detail": str(e)}
+
+        finally:
+            # Leaving the shared generation cancels it upstream (and frees
+            # its scheduler slot) if no one else follows it
+            if hasattr(tokens, "close"):
+                tokens.close()
+
+            if reply or not truncated:
+                full_reply = "".join(reply)
+                # No retrieval (no KB yet): nothing to key the entry on
+                if (prepared is not None and prepared.use_cache and prepared.retrieval is not None
+                        and prepared.cached_answer is None and leader and not truncated):
+                    answer_cache.store(prepared.retrieval.vector, prepared.retrieval.context_key, full_reply)
+                # Shielded: a cancelled stream must not abort the insert midway
+                await asyncio.shield(ChatService._save_reply(thread_id, full_reply, truncated))
+
+                # Fold older turns into the thread summary off the request path
+                ConversationMemory.schedule(thread_id)
+
+    @staticmethod
+    def _build_prompt(message: str, history: str, docs, legacy_docs):
+        # Merged, deduplicated, MMR-ordered context within the token budget.
+        # Returns (prompt, its tokens, old prompt tokens, tokens of the
+        # prompt without history); savings leave the history out since the
+        # old prompt never carried any.
+        context, _ = ContextBuilder.build(docs)
+        prompt = PROMPT_TEMPLATE.format(history=history, context=context, question=message)
+        prompt_tokens = token_counter.count(prompt)
+        naive_tokens = token_counter.count(legacy_prompt(legacy_docs, message))
+        compact_tokens = prompt_tokens
+        if history:
+            compact_tokens = token_counter.count(
+                PROMPT_TEMPLATE.format(history="", context=context, question=message)
             )
+        return prompt, prompt_tokens, naive_tokens, compact_tokens
 
-            async def event_stream():
-                full_reply = ""
-
-                for chunk in llm.stream(prompt):
-                    if chunk.content:
-                        full_reply += chunk.content
-                        yield chunk.content
-
-                # Save bot response
-                bot_msg = Message(
-                    id=str(uuid.uuid4()),
-                    thread_id=thread_id,
-                    sender="bot",
-                    text=full_reply
-                )
-                db.add(bot_msg)
-                db.commit()
-
-            return StreamingResponse(
-                event_stream(),
-                media_type="text/event-stream"
+    @staticmethod
+    async def _save_reply(thread_id: str, text: str, truncated: bool):
+        # Save bot response (every thread gets its own, coalesced or not); a
+        # partial answer is kept and marked truncated
+        async with AsyncSessionLocal() as db:
+            bot_msg = Message(
+                id=str(uuid.uuid4()),
+                thread_id=thread_id,
+                sender="bot",
+                text=text,
+                truncated=truncated
             )
+            db.add(bot_msg)
+            await db.commit()
 
-        finally:
-            db.close()
+    @staticmethod
+    async def _discard_question(message_id: str):
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(Message).where(Message.id == message_id))
+            await db.commit()
+
+    @staticmethod
+    def get_stats():
+        batcher = embedding_engine.query_batcher
+        return {
+            "retrieval_cache": RetrievalService.cache.stats(),
+            "query_batcher": batcher.stats() if batcher else None,
+            "answer_cache": answer_cache.stats(),
+            "rerank": RerankService.stats(),
+            "context": ContextBuilder.stats(),
+            "memory": ConversationMemory.stats(),
+            "llm": llm_client.stats(),
+            "single_flight": SingleFlight.stats(),
+            "scheduler": LLMScheduler.stats(),
+            "sse": SSEStreams.stats(),
+        }
 
     @staticmethod
     async def get_chat_history(thread_id: str, limit: int = 50, offset: int = 0) -> List[dict]:
-        db: Session = SessionLocal()
-        try:
-            messages = (
-                db.query(Message)
-                .filter(Message.thread_id == thread_id)
+        async with AsyncSessionLocal() as db:
+            messages = (await db.scalars(
+                select(Message)
+                .where(Message.thread_id == thread_id)
                 .order_by(Message.created_at)
                 .offset(offset)
                 .limit(limit)
-                .all()
-            )
-            history = [{"sender": m.sender, "text": m.text} for m in messages]
+            )).all()
+            history = [{"sender": m.sender, "text": m.text, "truncated": m.truncated} for m in messages]
             return history
-        finally:
-            db.close()
 
     @staticmethod
-    def get_all_threads(db: Session):
+    async def get_all_threads(db: AsyncSession):
         # Get latest message per thread to use as title
         subquery = (
-            db.query(
+            select(
                 Message.thread_id,
                 func.max(Message.created_at).label("last_msg_time")
             )
@@ -146,8 +345,8 @@ class ChatService:
             .subquery()
         )
 
-        threads = (
-            db.query(
+        threads = (await db.execute(
+            select(
                 Message.thread_id,
                 Message.text.label("title"),
                 Message.created_at
@@ -158,8 +357,7 @@ class ChatService:
                 (Message.created_at == subquery.c.last_msg_time)
             )
             .order_by(subquery.c.last_msg_time.desc())
-            .all()
-        )
+        )).all()
 
         # Return list of dicts with id and title
         return [{"id": t.thread_id, "title": t.title} for t in threads]
\ No newline at end of file
@@ -0,0 +1,208 @@
+import os
+import re
+import threading
+from pathlib import Path
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Chunks retrieved per question; assembly then keeps what fits the budget
+CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", 6))
+# Below the old top-3 context (3 x 500-character chunks, ~375 tokens), so
+# assembly shortens the prompt instead of filling a bigger window
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 320))
+# 1.0 = pure relevance order, lower values favour chunks unlike those chosen
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", 0.7))
+# Near-duplicates (token-set Jaccard) are dropped above this similarity
+CONTEXT_DUPLICATE_THRESHOLD = float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", 0.9))
+# HF tokenizer of the chat model (hub name or tokenizer.json path); tokens
+# are estimated at ~4 characters each when unset or unavailable
+CONTEXT_TOKENIZER = os.getenv("CONTEXT_TOKENIZER", "")
+
+_MIN_OVERLAP = 8
+_MAX_OVERLAP = 200  # splitter overlap is 50 characters; leave headroom
+_WORD = re.compile(r"\w+")
+
+
+class TokenCounter:
+
+    def __init__(self, name: str):
+        self.name = name
+        self._tokenizer = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            if self.name:
+                try:
+                    from tokenizers import Tokenizer
+
+                    if Path(self.name).exists():
+                        self._tokenizer = Tokenizer.from_file(self.name)
+                    else:
+                        self._tokenizer = Tokenizer.from_pretrained(self.name)
+                except Exception as e:
+                    print("Tokenizer unavailable, estimating tokens:", e)
+            self._loaded = True
+
+    @property
+    def exact(self):
+        if not self._loaded:
+            self._load()
+        return self._tokenizer is not None
+
+    def count(self, text: str) -> int:
+        if not self._loaded:
+            self._load()
+        if self._tokenizer is not None:
+            return len(self._tokenizer.encode(text, add_special_tokens=False).ids)
+        return (len(text) + 3) // 4
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if self.exact:
+            encoding = self._tokenizer.encode(text, add_special_tokens=False)
+            if len(encoding.ids) <= max_tokens:
+                return text
+            return text[:encoding.offsets[max_tokens - 1][1]]
+        return text[:max_tokens * 4]
+
+
+token_counter = TokenCounter(CONTEXT_TOKENIZER)
+
+
+def _words(text: str):
+    return set(_WORD.findall(text.lower()))
+
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _overlap(left: str, right: str) -> int:
+    # Length of the longest suffix of left that starts right
+    for n in range(min(len(left), len(right), _MAX_OVERLAP), _MIN_OVERLAP - 1, -1):
+        if left.endswith(right[:n]):
+            return n
+    return 0
+
+
+class ContextPiece:
+    def __init__(self, doc, rank: int):
+        self.text = doc.page_content.strip()
+        self.source = doc.metadata.get("source")
+        self.first_id = self.last_id = doc.metadata.get("index_id")
+        self.rank = rank
+        self.words = _words(self.text)
+
+    def follows(self, other) -> bool:
+        # Neighbouring chunks of one document: consecutive ids (chunks are
+        # numbered in reading order) or text overlapping the other's tail
+        if self.source != other.source:
+            return False
+        if self.first_id is not None and other.last_id is not None and self.first_id == other.last_id + 1:
+            return True
+        return _overlap(other.text, self.text) > 0
+
+    def absorb(self, nxt):
+        overlap = _overlap(self.text, nxt.text)
+        self.text = self.text + (nxt.text[overlap:] if overlap else "\n" + nxt.text)
+        self.last_id = nxt.last_id
+        self.rank = min(self.rank, nxt.rank)
+        self.words |= nxt.words
+
+
+class ContextBuilder:
+    # Turns retrieved chunks into the prompt context: duplicates dropped,
+    # neighbouring chunks merged into one passage without the repeated
+    # overlap, passages ordered by MMR and kept while they fit the budget.
+
+    requests = 0
+    naive_tokens = 0
+    prompt_tokens = 0
+    last = None
+
+    @staticmethod
+    def _dedupe(docs):
+        pieces, seen = [], set()
+        for rank, doc in enumerate(docs):
+            key = doc.metadata.get("chunk_id") or doc.page_content
+            if key in seen:
+                continue
+            seen.add(key)
+            piece = ContextPiece(doc, rank)
+            if any(_jaccard(piece.words, p.words) >= CONTEXT_DUPLICATE_THRESHOLD for p in pieces):
+                continue
+            pieces.append(piece)
+        return pieces
+
+    @staticmethod
+    def _merge(pieces):
+        ordered = sorted(
+            pieces,
+            key=lambda p: (p.source or "", p.first_id if p.first_id is not None else p.rank),
+        )
+        merged = []
+        for piece in ordered:
+            if merged and piece.follows(merged[-1]):
+                merged[-1].absorb(piece)
+            else:
+                merged.append(piece)
+        return merged
+
+    @staticmethod
+    def _mmr(pieces):
+        # Relevance comes from retrieval rank; similarity is word overlap
+        remaining = sorted(pieces, key=lambda p: p.rank)
+        count = len(remaining)
+        chosen = []
+        while remaining:
+            def score(p):
+                relevance = 1 - p.rank / max(1, count)
+                redundancy = max((_jaccard(p.words, c.words) for c in chosen), default=0.0)
+                return CONTEXT_MMR_LAMBDA * relevance - (1 - CONTEXT_MMR_LAMBDA) * redundancy
+
+            best = max(remaining, key=score)
+            remaining.remove(best)
+            chosen.append(best)
+        return chosen
+
+    @classmethod
+    def build(cls, docs, budget: int = CONTEXT_TOKEN_BUDGET):
+        # Returns (context text, token count of that text)
+        parts, used = [], 0
+        for piece in cls._mmr(cls._merge(cls._dedupe(docs))):
+            text = piece.text
+            tokens = token_counter.count(text)
+            if used + tokens > budget:
+                if parts:
+                    continue  # a smaller passage further down may still fit
+                # The most relevant passage alone is over budget: cut it
+                text = token_counter.truncate(text, budget)
+                tokens = token_counter.count(text)
+            parts.append(text)
+            used += tokens
+        return "\n\n".join(parts), used
+
+    @classmethod
+    def record(cls, naive_tokens: int, prompt_tokens: int):
+        cls.requests += 1
+        cls.naive_tokens += naive_tokens
+        cls.prompt_tokens += prompt_tokens
+        cls.last = {"naive_tokens": naive_tokens, "prompt_tokens": prompt_tokens}
+
+    @classmethod
+    def stats(cls):
+        saved = cls.naive_tokens - cls.prompt_tokens
+        return {
+            "tokenizer": CONTEXT_TOKENIZER if token_counter.exact else "estimate",
+            "requests": cls.requests,
+            "prompt_tokens": cls.prompt_tokens,
+            "tokens_saved": saved,
+            "saved_ratio": round(saved / cls.naive_tokens, 3) if cls.naive_tokens else 0,
+            "last": cls.last,
+        }
@@ -0,0 +1,173 @@
+import asyncio
+import os
+from sqlalchemy import func, select, update
+from models import Thread, Message
+from database import AsyncSessionLocal
+from services.context_builder import token_counter
+from services.llm_client import llm_client
+from services.llm_scheduler import LLMScheduler
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Newest messages sent verbatim with every question
+MEMORY_RECENT_MESSAGES = int(os.getenv("MEMORY_RECENT_MESSAGES", 6))
+# Older messages are folded into the summary once this many have piled up,
+# so the summarizer runs every few turns rather than after each one
+MEMORY_SUMMARY_EVERY = int(os.getenv("MEMORY_SUMMARY_EVERY", 4))
+MEMORY_SUMMARY_TOKENS = int(os.getenv("MEMORY_SUMMARY_TOKENS", 200))
+# Long answers are cut in the verbatim window
+MEMORY_MESSAGE_TOKENS = int(os.getenv("MEMORY_MESSAGE_TOKENS", 150))
+# Messages per summarizer call when catching up on a long thread
+MEMORY_SUMMARY_BATCH = 20
+
+SUMMARY_PROMPT = """Update the summary of a conversation between a user and a document assistant.
+Keep facts, names, numbers and open questions. Write at most {words} words, no preamble.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}
+
+Updated summary:"""
+
+
+def _transcript(messages, max_tokens=None):
+    lines = []
+    for m in messages:
+        text = (m.text or "").strip()
+        if max_tokens:
+            text = token_counter.truncate(text, max_tokens)
+        lines.append(f"{'User' if m.sender == 'user' else 'Assistant'}: {text}")
+    return "\n".join(lines)
+
+
+class ConversationMemory:
+    # Per-thread history for the prompt: a rolling summary stored on Thread
+    # plus the messages it does not cover yet. Whatever the thread length,
+    # the history stays under MEMORY_SUMMARY_TOKENS + (MEMORY_RECENT_MESSAGES
+    # + MEMORY_SUMMARY_EVERY) x MEMORY_MESSAGE_TOKENS tokens. Summaries are
+    # brought up to date in the background after an answer is saved, never
+    # on the request path.
+
+    _running = {}  # thread_id -> task
+
+    summaries = 0
+    failures = 0
+
+    @staticmethod
+    async def load(db, thread):
+        # Prompt section for the messages already in the thread; call before
+        # the new question is saved. Messages past the summary are verbatim:
+        # between summarizer runs that is up to MEMORY_SUMMARY_EVERY - 1 more
+        # than the recent window.
+        total = await db.scalar(select(func.count(Message.id)).where(Message.thread_id == thread.id))
+        window = min(
+            total - (thread.summarized_count or 0),
+            MEMORY_RECENT_MESSAGES + MEMORY_SUMMARY_EVERY - 1,
+        )
+        recent = []
+        if window > 0:
+            recent = (await db.scalars(
+                select(Message)
+                .where(Message.thread_id == thread.id)
+                .order_by(Message.created_at.desc(), Message.id.desc())
+                .limit(window)
+            )).all()
+            recent.reverse()
+
+        parts = []
+        if thread.summary:
+            parts.append(f"Conversation summary:\n{thread.summary}")
+        if recent:
+            parts.append(f"Recent messages:\n{_transcript(recent, MEMORY_MESSAGE_TOKENS)}")
+        return "\n\n".join(parts) + "\n\n" if parts else ""
+
+    @staticmethod
+    async def _pending(db, thread_id: str):
+        # Messages older than the verbatim window that the summary lacks
+        thread = await db.get(Thread, thread_id)
+        if thread is None:
+            return None, []
+        total = await db.scalar(select(func.count(Message.id)).where(Message.thread_id == thread_id))
+        count = total - MEMORY_RECENT_MESSAGES - thread.summarized_count
+        if count < MEMORY_SUMMARY_EVERY:
+            return thread, []
+
+        messages = (await db.scalars(
+            select(Message)
+            .where(Message.thread_id == thread_id)
+            .order_by(Message.created_at, Message.id)
+            .offset(thread.summarized_count)
+            .limit(min(count, MEMORY_SUMMARY_BATCH))
+        )).all()
+        return thread, messages
+
+    @staticmethod
+    async def _store(db, thread_id: str, start: int, count: int, summary: str):
+        # Conditional on the starting point so an overlapping run cannot
+        # fold the same messages in twice
+        result = await db.execute(
+            update(Thread)
+            .where(Thread.id == thread_id, Thread.summarized_count == start)
+            .values(summary=summary, summarized_count=start + count)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        return result.rowcount == 1
+
+    @classmethod
+    async def _summarize(cls, thread_id: str):
+        try:
+            while True:
+                # Short sessions: no pooled connection is held during the LLM call
+                async with AsyncSessionLocal() as db:
+                    thread, messages = await cls._pending(db, thread_id)
+                if not messages:
+                    return
+
+                start = thread.summarized_count
+                prompt = SUMMARY_PROMPT.format(
+                    words=int(MEMORY_SUMMARY_TOKENS * 0.75),
+                    summary=thread.summary or "(none)",
+                    messages=_transcript(messages),
+                )
+                # Shares the generation slots, fairly, with the chat requests
+                async with LLMScheduler.slot(f"summary:{thread_id}"):
+                    reply = await llm_client.complete(prompt, temperature=0)
+                summary = token_counter.truncate(reply.strip(), MEMORY_SUMMARY_TOKENS)
+
+                async with AsyncSessionLocal() as db:
+                    if not await cls._store(db, thread_id, start, len(messages), summary):
+                        return
+                cls.summaries += 1
+        except Exception as e:
+            # Also a full LLM queue: the thread keeps its previous summary
+            # and is retried next turn
+            cls.failures += 1
+            print("Summary update failed:", e)
+
+    @classmethod
+    def schedule(cls, thread_id: str):
+        # Called after each saved answer; one summarizer per thread at a time
+        task = cls._running.get(thread_id)
+        if task is not None and not task.done():
+            return
+        task = asyncio.create_task(cls._summarize(thread_id))
+        cls._running[thread_id] = task
+        task.add_done_callback(lambda t: cls._finished(thread_id, t))
+
+    @classmethod
+    def _finished(cls, thread_id: str, task):
+        if cls._running.get(thread_id) is task:
+            del cls._running[thread_id]
+
+    @classmethod
+    def stats(cls):
+        return {
+            "recent_messages": MEMORY_RECENT_MESSAGES,
+            "summaries": cls.summaries,
+            "failures": cls.failures,
+            "running": len(cls._running),
+        }
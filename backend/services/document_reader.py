@@ -0,0 +1,158 @@
+import codecs
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from PyPDF2 import PdfReader
+import docx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TXT_BLOCK_SIZE = 64 * 1024
+
+SUPPORTED_EXTENSIONS = [".txt", ".pdf", ".docx"]
+
+# PyPDF2 extract_text() is pure Python, so large PDFs are split into page
+# ranges and extracted in a process pool. 1 worker keeps it in-process.
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", os.cpu_count() or 1))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", 16))
+
+_pdf_pool = None
+_worker_readers = {}
+
+
+def _get_pdf_pool():
+    global _pdf_pool
+    if _pdf_pool is None:
+        # spawn, not fork: the web/ingest process is multi-threaded
+        _pdf_pool = ProcessPoolExecutor(
+            max_workers=PDF_EXTRACT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pdf_pool
+
+
+def _extract_pdf_range(path: str, start: int, end: int):
+    # Runs in a pool worker; each worker opens a given PDF only once
+    key = (path, os.path.getmtime(path))
+    reader = _worker_readers.get(key)
+    if reader is None:
+        _worker_readers.clear()
+        reader = _worker_readers[key] = PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def iter_pdf_pages(file_path: Path, workers: int = None, pages_per_task: int = None):
+    # Yields (page_no, text) in page order
+    workers = workers or PDF_EXTRACT_WORKERS
+    pages_per_task = pages_per_task or PDF_PAGES_PER_TASK
+    path = str(file_path)
+    reader = PdfReader(path)
+    total = len(reader.pages)
+
+    if workers <= 1 or total <= pages_per_task:
+        for page_no, page in enumerate(reader.pages, start=1):
+            yield page_no, page.extract_text() or ""
+        return
+
+    pool = _get_pdf_pool() if workers == PDF_EXTRACT_WORKERS else ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    )
+    ranges = iter(
+        (start, min(start + pages_per_task, total))
+        for start in range(0, total, pages_per_task)
+    )
+
+    # Bounded number of ranges in flight keeps memory flat on huge files;
+    # results are consumed strictly in submission order
+    in_flight = deque()
+    try:
+        for start, end in ranges:
+            in_flight.append((start, pool.submit(_extract_pdf_range, path, start, end)))
+            if len(in_flight) >= workers * 2:
+                break
+
+        while in_flight:
+            start, future = in_flight.popleft()
+            for offset, text in enumerate(future.result()):
+                yield start + offset + 1, text
+
+            next_range = next(ranges, None)
+            if next_range:
+                in_flight.append(
+                    (next_range[0], pool.submit(_extract_pdf_range, path, *next_range))
+                )
+    finally:
+        for _, future in in_flight:
+            future.cancel()
+        if pool is not _pdf_pool:
+            pool.shutdown(wait=False)
+
+
+def count_units(file_path: Path) -> int:
+    # Progress units: pages for PDF, paragraphs for DOCX, bytes for TXT
+    suffix = file_path.suffix.lower()
+
+    if suffix == ".pdf":
+        return len(PdfReader(str(file_path)).pages)
+    if suffix == ".docx":
+        return len(docx.Document(str(file_path)).paragraphs)
+    if suffix == ".txt":
+        return file_path.stat().st_size
+    return 0
+
+
+def iter_blocks(file_path: Path):
+    # Yields (units_done, text) one page / paragraph / block at a time, so
+    # the whole document is never held as one string
+    suffix = file_path.suffix.lower()
+
+    if suffix == ".txt":
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        done = 0
+        with open(file_path, "rb") as f:
+            while True:
+                raw = f.read(TXT_BLOCK_SIZE)
+                if not raw:
+                    break
+                done += len(raw)
+                yield done, decoder.decode(raw)
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield done, tail
+
+    elif suffix == ".pdf":
+        for page_no, page_text in iter_pdf_pages(file_path):
+            yield page_no, (page_text + "\n") if page_text else ""
+
+    elif suffix == ".docx":
+        # python-docx has to parse the whole document XML up front, so
+        # splitting paragraphs across processes would only repeat that work
+        doc = docx.Document(str(file_path))
+        for para_no, para in enumerate(doc.paragraphs, start=1):
+            yield para_no, para.text + "\n"
+
+
+def iter_chunks(blocks, text_splitter, window: int = None):
+    # Splits a bounded rolling buffer instead of the whole document. Every
+    # piece but the last is final; the last one may continue in the next
+    # block, so it is carried over and re-split with the following text.
+    window = window or text_splitter._chunk_size * 8
+    buffer = ""
+    units = 0
+
+    for units, text in blocks:
+        buffer += text
+        if len(buffer) < window:
+            continue
+
+        pieces = text_splitter.split_text(buffer)
+        for piece in pieces[:-1]:
+            yield units, piece
+        buffer = pieces[-1] if pieces else ""
+
+    if buffer.strip():
+        for piece in text_splitter.split_text(buffer):
+            yield units, piece
@@ -0,0 +1,148 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List
+from langchain_core.embeddings import Embeddings
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EMBEDDING_MODEL_NAME = os.getenv(
+    "EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2"
+)
+# torch intra-op threads used by every forward pass (0 = torch default)
+EMBEDDING_TORCH_THREADS = int(os.getenv("EMBEDDING_TORCH_THREADS", 0))
+# How many ingestion batches may run at once, and how big each one is for
+# embed_documents() callers (the build script). Small ingest batches keep
+# query embeddings from queueing behind a long forward pass while a
+# document is being indexed; the upload pipeline sizes its own batches by
+# latency instead (INGEST_TARGET_BATCH_MS) and uses embed_batch().
+EMBEDDING_INGEST_CONCURRENCY = int(os.getenv("EMBEDDING_INGEST_CONCURRENCY", 1))
+EMBEDDING_INGEST_BATCH_SIZE = int(os.getenv("EMBEDDING_INGEST_BATCH_SIZE", 16))
+# Concurrent query embeddings are coalesced into one forward pass: wait at
+# most this long for company, or stop early once the batch is full.
+# A window of 0 disables batching.
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", 5))
+EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", 32))
+
+
+class QueryBatcher:
+    # Callers block on a Future while a single worker thread gathers queued
+    # texts into batches and hands each caller its own row of the result.
+
+    def __init__(self, encode, window_ms: float, max_batch: int):
+        self._encode = encode
+        self.window = window_ms / 1000
+        self.max_batch = max(1, max_batch)
+        self._queue = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+
+        self.batches = 0
+        self.queries = 0
+
+    def submit(self, text: str) -> List[float]:
+        if self._worker is None:
+            with self._start_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, daemon=True)
+                    self._worker.start()
+
+        future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    # Window closed: still take anything already waiting
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                vectors = self._encode([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.queries += len(batch)
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "queries": self.queries,
+            "avg_batch_size": round(self.queries / self.batches, 2) if self.batches else 0,
+        }
+
+
+class EmbeddingEngine(Embeddings):
+    # One SentenceTransformer per process, loaded on first use and shared by
+    # query-time retrieval and ingestion.
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME):
+        self.model_name = model_name
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._ingest_slots = threading.BoundedSemaphore(max(1, EMBEDDING_INGEST_CONCURRENCY))
+        self.query_batcher = None
+        if EMBEDDING_BATCH_WINDOW_MS > 0 and EMBEDDING_MAX_BATCH > 1:
+            self.query_batcher = QueryBatcher(
+                self._encode, EMBEDDING_BATCH_WINDOW_MS, EMBEDDING_MAX_BATCH
+            )
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    import torch
+                    from sentence_transformers import SentenceTransformer
+
+                    if EMBEDDING_TORCH_THREADS > 0:
+                        torch.set_num_threads(EMBEDDING_TORCH_THREADS)
+                    self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        # Same preprocessing as HuggingFaceEmbeddings so existing indexes stay valid
+        texts = [t.replace("\n", " ") for t in texts]
+        return self.model.encode(texts, batch_size=len(texts) or 1).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.query_batcher is not None:
+            return self.query_batcher.submit(text)
+        return self._encode([text])[0]
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        # Exactly one forward pass over texts; the caller picks the size
+        with self._ingest_slots:
+            return self._encode(texts)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        with self._ingest_slots:
+            for i in range(0, len(texts), EMBEDDING_INGEST_BATCH_SIZE):
+                vectors.extend(self._encode(texts[i:i + EMBEDDING_INGEST_BATCH_SIZE]))
+        return vectors
+
+
+embedding_engine = EmbeddingEngine()
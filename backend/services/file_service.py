@@ -13,14 +13,6 @@ class FileService:
     def upload_file(file: UploadFile):
         db: Session = SessionLocal()
         try:
-            # Only allow one file: delete previous file record if exists
-            existing_file = db.query(ChatbotFile).first()
-            if existing_file:
-                if os.path.exists(existing_file.filepath):
-                    os.remove(existing_file.filepath)
-                db.delete(existing_file)
-                db.commit()
-
             # Save new file
             file_id = str(uuid.uuid4())
             file_path = os.path.join(UPLOAD_DIR, f"{file_id}_{file.filename}")
@@ -39,4 +31,39 @@ class FileService:
             return chatbot_file
         finally:
             db.close()
-    
\ No newline at end of file
+
+    @staticmethod
+    def list_files():
+        db: Session = SessionLocal()
+        try:
+            files = db.query(ChatbotFile).order_by(ChatbotFile.uploaded_at).all()
+            return [
+                {"id": f.id, "filename": f.filename, "uploaded_at": f.uploaded_at}
+                for f in files
+            ]
+        finally:
+            db.close()
+
+    @staticmethod
+    def get_file(file_id: str):
+        db: Session = SessionLocal()
+        try:
+            return db.query(ChatbotFile).filter(ChatbotFile.id == file_id).first()
+        finally:
+            db.close()
+
+    @staticmethod
+    def delete_file(file_id: str):
+        db: Session = SessionLocal()
+        try:
+            chatbot_file = db.query(ChatbotFile).filter(ChatbotFile.id == file_id).first()
+            if not chatbot_file:
+                return None
+
+            if os.path.exists(chatbot_file.filepath):
+                os.remove(chatbot_file.filepath)
+            db.delete(chatbot_file)
+            db.commit()
+            return chatbot_file
+        finally:
+            db.close()
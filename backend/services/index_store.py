@@ -0,0 +1,288 @@
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from services.vector_index import VectorIndex
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+VECTOR_STORE_PATH = BASE_DIR / "vector_store"
+# Pre-snapshot layout; still read when no snapshot has been published yet
+FAISS_INDEX_PATH = VECTOR_STORE_PATH / "faiss_index"
+SNAPSHOTS_PATH = VECTOR_STORE_PATH / "snapshots"
+CURRENT_POINTER = VECTOR_STORE_PATH / "CURRENT"
+# Held by whoever is building the next snapshot, in any process
+WRITE_LOCK_PATH = VECTOR_STORE_PATH / "LOCK"
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within a process
+    fcntl = None
+
+# Published snapshots kept on disk for rollback; older ones are deleted
+INDEX_SNAPSHOT_KEEP = int(os.getenv("INDEX_SNAPSHOT_KEEP", 3))
+# How often readers look at the pointer for snapshots published by
+# another process (e.g. scripts/build_vector_store.py)
+INDEX_POINTER_CHECK_SECONDS = float(os.getenv("INDEX_POINTER_CHECK_SECONDS", 1.0))
+
+VECTOR_STORE_PATH.mkdir(exist_ok=True)
+SNAPSHOTS_PATH.mkdir(exist_ok=True)
+
+
+def _fsync_path(path: Path):
+    fd = os.open(str(path), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class IndexSnapshot:
+    # A published index is never mutated again, so readers holding a
+    # snapshot can keep searching it while a newer one is swapped in.
+    def __init__(self, vector_index: VectorIndex, generation: int, name: str = None):
+        self.vector_index = vector_index
+        self.generation = generation
+        self.name = name
+
+
+class IndexStore:
+
+    _lock = threading.Lock()
+    # Reentrant: the migration in current_path() may run inside writing()
+    _write_lock = threading.RLock()
+    _write_depth = 0
+    _write_file = None
+    _snapshot = None
+    _loaded = False
+    _loaded_name = None
+    _next_check = 0.0
+    _listeners = []
+    generation = 0
+
+    @classmethod
+    def on_publish(cls, callback):
+        # Caches derived from the index register here to be dropped on swap
+        cls._listeners.append(callback)
+
+    # ---------- on-disk snapshots ----------
+
+    @classmethod
+    @contextmanager
+    def writing(cls):
+        # One writer at a time, across threads and processes (server
+        # workers, scripts/build_vector_store.py): hold it from reading
+        # current_path() until the new snapshot is committed, so no snapshot
+        # is ever built from a base that has been replaced in the meantime
+        with cls._write_lock:
+            if cls._write_depth == 0 and fcntl is not None:
+                cls._write_file = open(WRITE_LOCK_PATH, "a")
+                fcntl.flock(cls._write_file, fcntl.LOCK_EX)
+            cls._write_depth += 1
+            try:
+                yield
+            finally:
+                cls._write_depth -= 1
+                if cls._write_depth == 0 and cls._write_file is not None:
+                    fcntl.flock(cls._write_file, fcntl.LOCK_UN)
+                    cls._write_file.close()
+                    cls._write_file = None
+
+    @staticmethod
+    def current_name():
+        try:
+            return CURRENT_POINTER.read_text(encoding="utf-8").strip() or None
+        except FileNotFoundError:
+            return None
+
+    @classmethod
+    def current_path(cls):
+        # Directory of the live index, or None when nothing was built yet
+        name = cls.current_name()
+        if name and (SNAPSHOTS_PATH / name / "index.faiss").exists():
+            path = SNAPSHOTS_PATH / name
+        elif (FAISS_INDEX_PATH / "index.faiss").exists():
+            path = FAISS_INDEX_PATH
+        else:
+            return None
+
+        if not VectorIndex.exists(path):
+            path = cls._migrate(path)
+        return path
+
+    @classmethod
+    def _migrate(cls, path: Path):
+        # One-time conversion of a pickled langchain index into a snapshot in
+        # the mmap + SQLite format; the old files are left untouched
+        with cls.writing():
+            current = cls._migrated_path()
+            if current is not None:
+                return current
+
+            from langchain_community.vectorstores import FAISS
+            from services.embedding_service import embedding_engine
+
+            print(f"Migrating {path} to the mmap index format...")
+            vector_store = FAISS.load_local(
+                str(path), embedding_engine, allow_dangerous_deserialization=True
+            )
+            staging = cls.new_snapshot_dir()
+            VectorIndex.from_langchain(vector_store, staging).save()
+            return SNAPSHOTS_PATH / cls.commit_snapshot(staging)
+
+    @classmethod
+    def _migrated_path(cls):
+        name = cls.current_name()
+        if name and VectorIndex.exists(SNAPSHOTS_PATH / name):
+            return SNAPSHOTS_PATH / name
+        return None
+
+    @staticmethod
+    def list_snapshots():
+        return sorted(
+            p.name for p in SNAPSHOTS_PATH.iterdir()
+            if p.is_dir() and not p.name.startswith(".")
+        )
+
+    @staticmethod
+    def new_snapshot_dir():
+        # Builders write into a hidden staging directory, never a live one
+        staging = SNAPSHOTS_PATH / f".staging-{uuid.uuid4().hex}"
+        staging.mkdir()
+        return staging
+
+    @staticmethod
+    def _swap_pointer(name: str):
+        tmp = CURRENT_POINTER.with_name(f".CURRENT-{uuid.uuid4().hex}")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(name)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, CURRENT_POINTER)
+        _fsync_path(VECTOR_STORE_PATH)
+
+    @staticmethod
+    def discard_staging(staging: Path):
+        shutil.rmtree(staging, ignore_errors=True)
+
+    @classmethod
+    def commit_snapshot(cls, staging: Path, publish: bool = False):
+        # Callers hold writing() since they read the base they built on
+        # 1. make the staged files durable
+        for f in staging.iterdir():
+            _fsync_path(f)
+
+        # 2. give it the next version name (retry if another process won)
+        while True:
+            existing = cls.list_snapshots()
+            name = f"{int(existing[-1]) + 1 if existing else 1:08d}"
+            try:
+                os.rename(staging, SNAPSHOTS_PATH / name)
+                break
+            except OSError:
+                if (SNAPSHOTS_PATH / name).exists():
+                    continue
+                raise
+        _fsync_path(SNAPSHOTS_PATH)
+
+        # 3. atomic pointer swap; a crash before this leaves the old index live
+        cls._swap_pointer(name)
+
+        if publish:
+            cls.publish(cls.load(SNAPSHOTS_PATH / name), name)
+
+        cls.collect_garbage()
+        return name
+
+    @classmethod
+    def rollback(cls, name: str = None):
+        with cls.writing():
+            snapshots = cls.list_snapshots()
+            current = cls.current_name()
+
+            if name is None:
+                older = [s for s in snapshots if current and s < current]
+                if not older:
+                    return None
+                name = older[-1]
+            elif name not in snapshots:
+                return None
+
+            cls._swap_pointer(name)
+        return cls.reload()
+
+    @classmethod
+    def collect_garbage(cls):
+        current = cls.current_name()
+        if INDEX_SNAPSHOT_KEEP > 0:
+            for name in cls.list_snapshots()[:-INDEX_SNAPSHOT_KEEP]:
+                if name != current:
+                    shutil.rmtree(SNAPSHOTS_PATH / name, ignore_errors=True)
+
+        # Staging dirs left behind by a crashed build
+        for p in SNAPSHOTS_PATH.glob(".staging-*"):
+            if time.time() - p.stat().st_mtime > 3600:
+                shutil.rmtree(p, ignore_errors=True)
+
+    # ---------- resident index ----------
+
+    @staticmethod
+    def load(path: Path):
+        # Memory-mapped and read-only; published snapshots never change
+        return VectorIndex.open(path)
+
+    @classmethod
+    def reload(cls):
+        name = cls.current_name()
+        path = cls.current_path()
+        if path is None:
+            return None
+        return cls.publish(cls.load(path), name)
+
+    @classmethod
+    def current(cls):
+        # Fast path: no lock and no disk access between pointer checks
+        if cls._loaded and time.monotonic() < cls._next_check:
+            return cls._snapshot
+
+        if cls._loaded:
+            cls._next_check = time.monotonic() + INDEX_POINTER_CHECK_SECONDS
+            name = cls.current_name()
+            if name is None or name == cls._loaded_name:
+                return cls._snapshot
+            # Another process published (or rolled back to) another snapshot
+            return cls.reload() or cls._snapshot
+
+        with cls._lock:
+            if not cls._loaded:
+                name = cls.current_name()
+                path = cls.current_path()
+                if path is not None:
+                    cls.generation += 1
+                    cls._snapshot = IndexSnapshot(cls.load(path), cls.generation, name)
+                cls._loaded_name = name
+                cls._loaded = True
+                cls._next_check = time.monotonic() + INDEX_POINTER_CHECK_SECONDS
+
+        return cls._snapshot
+
+    @classmethod
+    def publish(cls, vector_index: VectorIndex, name: str = None):
+        # Single reference assignment: requests see either the old or the new
+        # snapshot, never a mix of both
+        with cls._lock:
+            cls.generation += 1
+            cls._snapshot = IndexSnapshot(vector_index, cls.generation, name)
+            cls._loaded_name = name
+            cls._loaded = True
+            snapshot = cls._snapshot
+
+        for callback in cls._listeners:
+            callback(snapshot)
+
+        return snapshot
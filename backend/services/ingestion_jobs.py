@@ -0,0 +1,205 @@
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from services.vector_service import VectorService
+from services.index_store import IndexStore
+from services.file_service import FileService
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Dedicated ingestion threads, separate from the request threadpool, so a
+# bulk upload can never occupy the threads that serve API requests
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 2))
+INGEST_MAX_PENDING = int(os.getenv("INGEST_MAX_PENDING", 100))
+INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", 200))
+
+DEFAULT_INDEX = "default"
+
+
+class IngestionQueueFull(Exception):
+    pass
+
+
+class IngestionJob:
+
+    def __init__(self, file_id: str, file_path: str, index_name: str = DEFAULT_INDEX,
+                 action: str = "index"):
+        self.id = str(uuid.uuid4())
+        self.file_id = file_id
+        self.file_path = file_path
+        self.index_name = index_name
+        self.action = action  # "index" or "delete"
+
+        self.status = "queued"
+        self.progress = 0
+        self.time_taken = 0
+        self.units_total = 0
+        self.units_done = 0
+        self.chunks_total = 0
+        self.chunks_skipped = 0
+        self.error = None
+        self.snapshot = None
+        self.pipeline = None
+        self.cancel_event = threading.Event()
+        self.created_at = time.time()
+
+    @property
+    def finished(self):
+        return self.status in ("ready", "error", "cancelled")
+
+    def sync_progress(self):
+        # Pulls live counters from the running pipeline
+        pipeline = self.pipeline
+        if pipeline is None:
+            return
+
+        self.units_done = pipeline.units_done
+        self.chunks_total = pipeline.chunks_total
+        self.chunks_skipped = pipeline.chunks_skipped
+        if self.status == "processing" and self.units_total:
+            self.progress = min(99, int((pipeline.units_done / self.units_total) * 100))
+
+    def to_dict(self):
+        self.sync_progress()
+        return {
+            "job_id": self.id,
+            "file_id": self.file_id,
+            "index": self.index_name,
+            "action": self.action,
+            "status": self.status,
+            "progress": self.progress,
+            "time_taken": self.time_taken,
+            "units_total": self.units_total,
+            "units_done": self.units_done,
+            "chunks_total": self.chunks_total,
+            "chunks_skipped": self.chunks_skipped,
+            "error": self.error,
+            "snapshot": self.snapshot,
+            "pipeline": self.pipeline.stats() if self.pipeline else None,
+        }
+
+
+class IngestionJobService:
+
+    _jobs = OrderedDict()
+    _queue = queue.Queue(maxsize=INGEST_MAX_PENDING)
+    _workers = []
+    _lock = threading.Lock()
+    # Jobs writing the same index run one at a time
+    _index_locks = defaultdict(threading.Lock)
+
+    @classmethod
+    def _ensure_workers(cls):
+        with cls._lock:
+            if cls._workers:
+                return
+            for n in range(max(1, INGEST_WORKERS)):
+                worker = threading.Thread(
+                    target=cls._work, name=f"ingest-worker-{n}", daemon=True
+                )
+                worker.start()
+                cls._workers.append(worker)
+
+    @classmethod
+    def _work(cls):
+        while True:
+            job = cls._queue.get()
+            try:
+                if job.cancel_event.is_set():
+                    job.status = "cancelled"
+                    continue
+
+                with cls._index_locks[job.index_name]:
+                    if job.action == "delete":
+                        VectorService.remove_file(job)
+                    else:
+                        VectorService.build_index(job)
+                # Cancelled while queued is dropped by cancel() itself
+                if job.status == "cancelled":
+                    cls._drop_unindexed(job)
+            except Exception as e:
+                print("Ingestion job failed:", e)
+                job.status = "error"
+                job.error = str(e)
+            finally:
+                cls._queue.task_done()
+
+    @classmethod
+    def submit(cls, file_id: str, file_path: str, index_name: str = DEFAULT_INDEX,
+               action: str = "index"):
+        cls._ensure_workers()
+        job = IngestionJob(file_id, file_path, index_name, action)
+
+        try:
+            cls._queue.put_nowait(job)
+        except queue.Full:
+            raise IngestionQueueFull()
+
+        with cls._lock:
+            cls._jobs[job.id] = job
+            # Forget the oldest finished jobs once history is full
+            while len(cls._jobs) > INGEST_JOB_HISTORY:
+                oldest_id, oldest = next(iter(cls._jobs.items()))
+                if not oldest.finished:
+                    break
+                del cls._jobs[oldest_id]
+
+        return job
+
+    @classmethod
+    def get(cls, job_id: str):
+        return cls._jobs.get(job_id)
+
+    @classmethod
+    def list_jobs(cls):
+        with cls._lock:
+            return list(cls._jobs.values())
+
+    @classmethod
+    def latest(cls):
+        with cls._lock:
+            return next(reversed(cls._jobs.values()), None)
+
+    @classmethod
+    def cancel(cls, job_id: str):
+        job = cls._jobs.get(job_id)
+        if job is None:
+            return None
+
+        job.cancel_event.set()
+        if job.status == "queued":
+            job.status = "cancelled"
+            cls._drop_unindexed(job)
+        return job
+
+    @staticmethod
+    def _drop_unindexed(job):
+        # A cancelled build commits nothing, so its upload would be listed
+        # but never searchable: drop the row and file (no-op when the
+        # document is already being deleted)
+        if job.action == "index":
+            try:
+                FileService.delete_file(job.file_id)
+            except Exception as e:
+                print("Could not remove cancelled upload:", e)
+
+    @classmethod
+    def cancel_file(cls, file_id: str):
+        # Pending or running builds of a document that is being deleted
+        for job in cls.list_jobs():
+            if job.file_id == file_id and job.action == "index" and not job.finished:
+                cls.cancel(job.id)
+
+    @classmethod
+    def rollback(cls, snapshot: str = None, index_name: str = DEFAULT_INDEX):
+        # Never swap the pointer underneath a build of the same index
+        with cls._index_locks[index_name]:
+            return IndexStore.rollback(snapshot)
+
+    @classmethod
+    def queue_depth(cls):
+        return cls._queue.qsize()
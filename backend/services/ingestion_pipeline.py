@@ -0,0 +1,208 @@
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from services.embedding_service import embedding_engine
+from services.vector_index import VectorIndex, chunk_hash
+from services.document_reader import iter_blocks, iter_chunks
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Bounded hand-off between stages: a slow embedder back-pressures parsing
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", 64))
+# Embedding batches grow or shrink so one forward pass takes about this long
+INGEST_TARGET_BATCH_MS = float(os.getenv("INGEST_TARGET_BATCH_MS", 250))
+INGEST_MIN_BATCH = int(os.getenv("INGEST_MIN_BATCH", 4))
+INGEST_MAX_BATCH = int(os.getenv("INGEST_MAX_BATCH", 128))
+
+_DONE = object()
+_POLL_SECONDS = 0.1
+
+
+class IngestionCancelled(Exception):
+    pass
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+
+    def record(self, items: int, seconds: float):
+        self.items += items
+        self.busy += seconds
+
+    def to_dict(self):
+        return {
+            "items": self.items,
+            "busy_seconds": round(self.busy, 3),
+            "items_per_second": round(self.items / self.busy, 1) if self.busy else 0,
+        }
+
+
+class IngestionPipeline:
+    # parse -> chunk -> embed -> insert, one thread per stage, connected by
+    # bounded queues so all four overlap. The insert stage is the only one
+    # writing to the vector index.
+
+    def __init__(self, file_path: Path, vector_index: VectorIndex,
+                 cancel_event: threading.Event, text_splitter, file_id: str = None):
+        self.file_path = file_path
+        self.file_id = file_id
+        self.vector_index = vector_index
+        self.cancel_event = cancel_event
+        self.text_splitter = text_splitter
+
+        self.block_queue = queue.Queue(maxsize=INGEST_QUEUE_SIZE)
+        self.chunk_queue = queue.Queue(maxsize=INGEST_QUEUE_SIZE)
+        self.insert_queue = queue.Queue(maxsize=max(2, INGEST_QUEUE_SIZE // 8))
+
+        self.stages = {name: StageStats(name) for name in ("parse", "chunk", "embed", "insert")}
+        self.batch_size = INGEST_MIN_BATCH
+        self.units_done = 0
+        self.chunks_total = 0
+        self.chunks_skipped = 0
+        self.embedded = 0
+        self._error = None
+
+    # ---------- queue helpers that stay responsive to cancel ----------
+
+    def _put(self, q: queue.Queue, item):
+        while True:
+            if self.cancel_event.is_set():
+                raise IngestionCancelled()
+            try:
+                q.put(item, timeout=_POLL_SECONDS)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q: queue.Queue):
+        while True:
+            if self.cancel_event.is_set():
+                raise IngestionCancelled()
+            try:
+                return q.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                continue
+
+    def _drain(self, q: queue.Queue):
+        while True:
+            item = self._get(q)
+            if item is _DONE:
+                return
+            yield item
+
+    # ---------- stages ----------
+
+    def _parse(self):
+        blocks = iter_blocks(self.file_path)
+        while True:
+            start = time.perf_counter()
+            block = next(blocks, _DONE)
+            if block is _DONE:
+                break
+            self.stages["parse"].record(1, time.perf_counter() - start)
+            self._put(self.block_queue, block)
+        self._put(self.block_queue, _DONE)
+
+    def _chunk(self):
+        seen = set()
+        chunks = iter_chunks(self._drain(self.block_queue), self.text_splitter)
+        while True:
+            start = time.perf_counter()
+            item = next(chunks, _DONE)
+            if item is _DONE:
+                break
+            units, chunk = item
+            hash_ = chunk_hash(chunk)
+            self.stages["chunk"].record(1, time.perf_counter() - start)
+
+            self.chunks_total += 1
+            # Repeated in this document, or already embedded for another
+            # document (then only tagged with this one too)
+            if hash_ in seen or self.vector_index.link(hash_, self.file_id):
+                self.chunks_skipped += 1
+                self.units_done = units
+                continue
+            seen.add(hash_)
+            self._put(self.chunk_queue, (units, hash_, chunk))
+        self._put(self.chunk_queue, _DONE)
+
+    def _embed(self):
+        finished = False
+        while not finished:
+            batch = []
+            while len(batch) < self.batch_size:
+                item = self._get(self.chunk_queue)
+                if item is _DONE:
+                    finished = True
+                    break
+                batch.append(item)
+            if not batch:
+                break
+
+            start = time.perf_counter()
+            # One forward pass of the adaptive size, not re-split downstream
+            vectors = embedding_engine.embed_batch([chunk for _, _, chunk in batch])
+            elapsed = time.perf_counter() - start
+            self.stages["embed"].record(len(batch), elapsed)
+
+            # Adaptive batch: scale towards the target forward-pass latency
+            if elapsed > 0:
+                scaled = int(len(batch) * (INGEST_TARGET_BATCH_MS / 1000) / elapsed)
+                self.batch_size = max(INGEST_MIN_BATCH, min(INGEST_MAX_BATCH, scaled))
+
+            self._put(self.insert_queue, (batch, vectors))
+        self._put(self.insert_queue, _DONE)
+
+    def _insert(self):
+        source = self.file_path.name
+        for batch, vectors in self._drain(self.insert_queue):
+            start = time.perf_counter()
+            texts = [chunk for _, _, chunk in batch]
+            hashes = [hash_ for _, hash_, _ in batch]
+
+            # A new index of a trained type buffers until it has enough vectors
+            self.vector_index.add(texts, vectors, hashes, source, self.file_id)
+
+            self.embedded += len(batch)
+            self.units_done = max(self.units_done, batch[-1][0])
+            self.stages["insert"].record(len(batch), time.perf_counter() - start)
+
+    # ---------- orchestration ----------
+
+    def _run_stage(self, target):
+        try:
+            target()
+        except IngestionCancelled:
+            pass
+        except Exception as e:
+            # Any failing stage stops the others through the cancel event
+            self._error = self._error or e
+            self.cancel_event.set()
+
+    def run(self):
+        threads = [
+            threading.Thread(target=self._run_stage, args=(stage,), daemon=True)
+            for stage in (self._parse, self._chunk, self._embed, self._insert)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        if self._error is not None:
+            raise self._error
+        if self.cancel_event.is_set():
+            raise IngestionCancelled()
+        return self.vector_index
+
+    def stats(self):
+        return {
+            "batch_size": self.batch_size,
+            "stages": {name: stage.to_dict() for name, stage in self.stages.items()},
+        }
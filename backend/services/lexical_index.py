@@ -0,0 +1,265 @@
+import itertools
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter, OrderedDict
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BM25_K1 = float(os.getenv("BM25_K1", 1.2))
+BM25_B = float(os.getenv("BM25_B", 0.75))
+# Decoded posting lists kept per snapshot, by term
+BM25_POSTINGS_CACHE = int(os.getenv("BM25_POSTINGS_CACHE", 4096))
+# Merged posting lists written per statement when flushing
+_WRITE_BATCH = 500
+
+STOP_WORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it of on or "
+    "the this to was what when where which who why with you your".split()
+)
+
+_WORD = re.compile(r"\w+")
+# Codes such as "E-1043", "X42Z" or "v2.1.0" are also kept whole
+_COMPOUND = re.compile(r"\w+(?:[-./]\w+)+")
+
+# Posting lists are delta-encoded chunk ids in the narrowest dtype that fits,
+# followed by one uint8 term frequency per posting
+_ID_DTYPES = (np.uint8, np.uint16, np.uint32)
+
+
+def tokenize(text: str):
+    text = text.lower()
+    tokens = [t for t in _WORD.findall(text) if t not in STOP_WORDS]
+    tokens.extend(_COMPOUND.findall(text))
+    return tokens
+
+
+def encode_postings(ids: np.ndarray, tfs: np.ndarray) -> bytes:
+    deltas = np.diff(ids, prepend=0)
+    code = next(n for n, dtype in enumerate(_ID_DTYPES) if deltas.max() <= np.iinfo(dtype).max)
+    return (
+        bytes([code])
+        + deltas.astype(_ID_DTYPES[code]).tobytes()
+        + np.minimum(tfs, 255).astype(np.uint8).tobytes()
+    )
+
+
+def decode_postings(data: bytes):
+    dtype = _ID_DTYPES[data[0]]
+    count = (len(data) - 1) // (np.dtype(dtype).itemsize + 1)
+    deltas = np.frombuffer(data, dtype=dtype, count=count, offset=1)
+    tfs = np.frombuffer(data, dtype=np.uint8, offset=1 + deltas.nbytes)
+    return np.cumsum(deltas, dtype=np.int64), tfs.astype(np.float32)
+
+
+def create_tables(db: sqlite3.Connection):
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS postings ("
+        " term TEXT PRIMARY KEY,"
+        " df INTEGER NOT NULL,"
+        " data BLOB NOT NULL) WITHOUT ROWID"
+    )
+    db.execute("CREATE TABLE IF NOT EXISTS lexical_meta (key TEXT PRIMARY KEY, value BLOB)")
+
+
+def _create_staging(db: sqlite3.Connection):
+    # Temp tables: private to the writer connection and gone once it
+    # closes, so they never end up in a published snapshot
+    db.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS lexical_pending ("
+        " term TEXT NOT NULL,"
+        " chunk_id INTEGER NOT NULL,"
+        " tf INTEGER NOT NULL,"
+        " PRIMARY KEY (term, chunk_id)) WITHOUT ROWID"
+    )
+    db.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS lexical_pending_lengths ("
+        " chunk_id INTEGER PRIMARY KEY,"
+        " length INTEGER NOT NULL)"
+    )
+
+
+class LexicalIndex:
+    # BM25 over an inverted index stored in the snapshot's SQLite file.
+    # Writers stage postings for new chunks in SQLite with each insert batch
+    # (memory stays bounded by the batch, as in streaming ingestion) and
+    # merge them into the touched terms only on flush; readers decode a
+    # term's list once and keep it cached.
+
+    def __init__(self, connect):
+        self._connect = connect  # returns a connection usable by this thread
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._lengths = None
+        self._avg_length = 0.0
+        self._doc_count = 0
+        self._staged = False
+
+    # ---------- writes ----------
+
+    def add(self, db: sqlite3.Connection, ids, texts):
+        # Called with each insert batch, on the writer connection
+        _create_staging(db)
+        postings, lengths = [], []
+        for chunk_id, text in zip(ids, texts):
+            counts = Counter(tokenize(text))
+            lengths.append((int(chunk_id), sum(counts.values())))
+            postings.extend((term, int(chunk_id), tf) for term, tf in counts.items())
+        db.executemany("INSERT INTO lexical_pending (term, chunk_id, tf) VALUES (?, ?, ?)", postings)
+        db.executemany("INSERT INTO lexical_pending_lengths (chunk_id, length) VALUES (?, ?)", lengths)
+        self._staged = True
+
+    def flush(self, db: sqlite3.Connection):
+        # New chunk ids are always larger than stored ones, so merging is an
+        # append to each touched posting list. Staged rows are read in term
+        # order, so one posting list is in memory at a time.
+        if not self._staged:
+            return
+
+        rows = []
+        staged = db.execute("SELECT term, chunk_id, tf FROM lexical_pending ORDER BY term, chunk_id")
+        for term, new in itertools.groupby(staged, key=lambda row: row[0]):
+            new = np.array([(p[1], p[2]) for p in new], dtype=np.int64)
+            ids, tfs = new[:, 0], new[:, 1]
+            row = db.execute("SELECT data FROM postings WHERE term = ?", (term,)).fetchone()
+            if row is not None:
+                old_ids, old_tfs = decode_postings(row[0])
+                ids = np.concatenate([old_ids, ids])
+                tfs = np.concatenate([old_tfs.astype(np.int64), tfs])
+            rows.append((term, len(ids), encode_postings(ids, tfs)))
+            if len(rows) >= _WRITE_BATCH:
+                db.executemany("INSERT OR REPLACE INTO postings (term, df, data) VALUES (?, ?, ?)", rows)
+                rows = []
+        db.executemany("INSERT OR REPLACE INTO postings (term, df, data) VALUES (?, ?, ?)", rows)
+
+        lengths = self._load_lengths(db)
+        last = db.execute("SELECT MAX(chunk_id) FROM lexical_pending_lengths").fetchone()[0]
+        size = max(len(lengths), last + 1)
+        lengths = np.concatenate([lengths, np.zeros(size - len(lengths), dtype=np.uint16)])
+        for chunk_id, length in db.execute("SELECT chunk_id, length FROM lexical_pending_lengths"):
+            lengths[chunk_id] = min(length, 65535)
+        db.execute(
+            "INSERT OR REPLACE INTO lexical_meta (key, value) VALUES ('lengths', ?)",
+            (lengths.tobytes(),),
+        )
+
+        db.execute("DELETE FROM lexical_pending")
+        db.execute("DELETE FROM lexical_pending_lengths")
+        self._staged = False
+
+    def remove(self, db: sqlite3.Connection, ids, texts):
+        # Only the terms of the removed chunks are rewritten; staged chunks
+        # are merged first so they are covered too
+        self.flush(db)
+        removed = np.array(sorted(int(i) for i in ids), dtype=np.int64)
+        terms = set()
+        for text in texts:
+            terms.update(tokenize(text))
+
+        updates, deletes = [], []
+        for term in terms:
+            row = db.execute("SELECT data FROM postings WHERE term = ?", (term,)).fetchone()
+            if row is None:
+                continue
+            term_ids, tfs = decode_postings(row[0])
+            keep = ~np.isin(term_ids, removed)
+            if keep.all():
+                continue
+            if keep.any():
+                updates.append((term, int(keep.sum()), encode_postings(term_ids[keep], tfs[keep].astype(np.int64))))
+            else:
+                deletes.append((term,))
+        db.executemany("INSERT OR REPLACE INTO postings (term, df, data) VALUES (?, ?, ?)", updates)
+        db.executemany("DELETE FROM postings WHERE term = ?", deletes)
+
+        lengths = self._load_lengths(db)
+        lengths[removed[removed < len(lengths)]] = 0
+        db.execute(
+            "INSERT OR REPLACE INTO lexical_meta (key, value) VALUES ('lengths', ?)",
+            (lengths.tobytes(),),
+        )
+
+    @staticmethod
+    def _load_lengths(db: sqlite3.Connection):
+        row = db.execute("SELECT value FROM lexical_meta WHERE key = 'lengths'").fetchone()
+        if row is None:
+            return np.zeros(0, dtype=np.uint16)
+        return np.frombuffer(row[0], dtype=np.uint16).copy()
+
+    @staticmethod
+    def needs_backfill(db: sqlite3.Connection):
+        # Snapshots written before the lexical index existed
+        has_chunks = db.execute("SELECT 1 FROM chunks LIMIT 1").fetchone() is not None
+        has_lengths = db.execute(
+            "SELECT 1 FROM lexical_meta WHERE key = 'lengths'"
+        ).fetchone() is not None
+        return has_chunks and not has_lengths
+
+    # ---------- reads ----------
+
+    def _postings(self, db, term: str):
+        with self._lock:
+            if term in self._cache:
+                self._cache.move_to_end(term)
+                return self._cache[term]
+
+        row = db.execute("SELECT data FROM postings WHERE term = ?", (term,)).fetchone()
+        postings = decode_postings(row[0]) if row is not None else None
+
+        with self._lock:
+            self._cache[term] = postings
+            while len(self._cache) > BM25_POSTINGS_CACHE:
+                self._cache.popitem(last=False)
+        return postings
+
+    def search(self, query: str, k: int, allowed=None):
+        # Chunk ids ranked by BM25, best first; allowed (sorted ids) filters
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+
+        try:
+            db = self._connect()
+            if self._lengths is None:
+                lengths = self._load_lengths(db)
+                present = lengths[lengths > 0]
+                self._avg_length = float(present.mean()) if len(present) else 0.0
+                self._doc_count = len(present)
+                self._lengths = lengths.astype(np.float32)
+        except sqlite3.OperationalError:
+            return []  # snapshot without lexical tables
+        if not self._doc_count:
+            return []
+
+        all_ids, all_scores = [], []
+        for term in terms:
+            postings = self._postings(db, term)
+            if postings is None:
+                continue
+            ids, tfs = postings
+            idf = math.log(1 + (self._doc_count - len(ids) + 0.5) / (len(ids) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[ids] / self._avg_length)
+            all_ids.append(ids)
+            all_scores.append(idf * tfs * (BM25_K1 + 1) / (tfs + norm))
+
+        if not all_ids:
+            return []
+
+        ids = np.concatenate(all_ids)
+        weights = np.concatenate(all_scores)
+        if allowed is not None:
+            mask = np.isin(ids, allowed)
+            ids, weights = ids[mask], weights[mask]
+            if not len(ids):
+                return []
+
+        unique, inverse = np.unique(ids, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights)
+
+        top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [int(unique[i]) for i in top]
@@ -0,0 +1,138 @@
+import asyncio
+import json
+import os
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+LLM_MODEL = os.getenv("LLM_MODEL", "llama3")
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", 0.2))
+# How long Ollama keeps the model in memory after a request ("30m", "-1" =
+# forever); sent with every call so an idle spell never forces a reload
+LLM_KEEP_ALIVE = os.getenv("LLM_KEEP_ALIVE", "30m")
+# Load the model at startup instead of on the first question
+LLM_WARMUP = os.getenv("LLM_WARMUP", "true").lower() == "true"
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 32))
+# Read timeout between streamed lines; a cold model load can take a while
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 300))
+
+
+def _keep_alive(value):
+    # Ollama takes durations ("30m") or seconds; "-1" must go out as a number
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+class LLMClient:
+    # Process-wide Ollama client: one pooled httpx.AsyncClient whose
+    # keep-alive connections are reused by every request, instead of a new
+    # ChatOllama (and HTTP session) per question. Streams /api/chat NDJSON.
+
+    def __init__(self, base_url: str = OLLAMA_BASE_URL, model: str = LLM_MODEL):
+        self.base_url = base_url
+        self.model = model
+        self._client = None
+        self._loop = None
+
+        self.requests = 0
+        self.failures = 0
+        self.warmed_up = False
+
+    def _http(self):
+        # Connections belong to the loop that opened them; scripts that call
+        # asyncio.run() more than once get a fresh pool per loop
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_CONNECTIONS,
+                ),
+                timeout=httpx.Timeout(LLM_TIMEOUT, connect=10.0),
+            )
+            self._loop = loop
+        return self._client
+
+    def _payload(self, prompt, stream: bool, model=None, keep_alive=None, **options):
+        # Per-call overrides: model, keep_alive and any Ollama option
+        # (temperature, num_ctx, num_predict, ...)
+        messages = [{"role": "user", "content": prompt}] if isinstance(prompt, str) else prompt
+        return {
+            "model": model or self.model,
+            "messages": messages,
+            "stream": stream,
+            "keep_alive": _keep_alive(keep_alive if keep_alive is not None else LLM_KEEP_ALIVE),
+            "options": {"temperature": LLM_TEMPERATURE, **options},
+        }
+
+    async def stream(self, prompt, **overrides):
+        # Yields content pieces as Ollama produces them
+        self.requests += 1
+        payload = self._payload(prompt, True, **overrides)
+        try:
+            async with self._http().stream("POST", "/api/chat", json=payload) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    raise RuntimeError(f"Ollama returned {response.status_code}: {response.text}")
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    if "error" in data:
+                        raise RuntimeError(f"Ollama error: {data['error']}")
+                    # Read to the end (no break on "done") so the connection
+                    # goes back to the pool instead of being dropped
+                    content = data.get("message", {}).get("content")
+                    if content:
+                        yield content
+        except Exception:
+            self.failures += 1
+            raise
+
+    async def complete(self, prompt, **overrides) -> str:
+        self.requests += 1
+        try:
+            response = await self._http().post("/api/chat", json=self._payload(prompt, False, **overrides))
+            response.raise_for_status()
+            data = response.json()
+            if "error" in data:
+                raise RuntimeError(f"Ollama error: {data['error']}")
+            return data.get("message", {}).get("content", "")
+        except Exception:
+            self.failures += 1
+            raise
+
+    async def warmup(self):
+        # A chat request without messages only loads the model
+        try:
+            response = await self._http().post(
+                "/api/chat",
+                json={"model": self.model, "messages": [], "keep_alive": _keep_alive(LLM_KEEP_ALIVE)},
+            )
+            response.raise_for_status()
+            self.warmed_up = True
+            print(f"LLM model '{self.model}' loaded (keep_alive={LLM_KEEP_ALIVE})")
+        except Exception as e:
+            print("LLM warmup failed:", e)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self):
+        return {
+            "model": self.model,
+            "keep_alive": LLM_KEEP_ALIVE,
+            "warmed_up": self.warmed_up,
+            "requests": self.requests,
+            "failures": self.failures,
+        }
+
+
+llm_client = LLMClient()
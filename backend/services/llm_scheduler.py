@@ -0,0 +1,214 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Generations allowed to run on Ollama at once (match OLLAMA_NUM_PARALLEL)
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", 4))
+# Requests allowed to wait for a slot; beyond that they get 429
+LLM_QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", 32))
+# Retry-After (seconds) until enough generations finished to estimate it
+LLM_RETRY_AFTER = int(os.getenv("LLM_RETRY_AFTER", 5))
+
+_SAMPLES = 500
+
+
+class QueueFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"LLM queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Ticket:
+    def __init__(self, owner: str):
+        self.owner = owner
+        self.granted = False
+        self.closed = False
+        self.enqueued_at = time.monotonic()
+        self.started_at = None
+        self._event = asyncio.Event()
+
+
+class LLMScheduler:
+    # Admission control in front of the LLM client. At most LLM_CONCURRENCY
+    # generations run; up to LLM_QUEUE_SIZE more wait. Waiters are kept per
+    # owner (chat thread) and slots go round-robin across owners, so one
+    # thread firing many questions cannot starve the others.
+
+    _queues = OrderedDict()  # owner -> deque of tickets, in rotation order
+    _active = 0
+    _waiting = 0
+    _changed = None
+
+    admitted = 0
+    rejected = 0
+    completed = 0
+    max_depth = 0
+    _waits = deque(maxlen=_SAMPLES)
+    _durations = deque(maxlen=_SAMPLES)
+
+    @classmethod
+    def _notify(cls):
+        if cls._changed is not None:
+            cls._changed.set()
+        cls._changed = asyncio.Event()
+
+    @classmethod
+    def retry_after(cls) -> int:
+        # Time for the queue ahead to drain at the recent generation speed
+        if not cls._durations:
+            return LLM_RETRY_AFTER
+        average = sum(cls._durations) / len(cls._durations)
+        return max(1, math.ceil(average * (cls._waiting + 1) / LLM_CONCURRENCY))
+
+    @classmethod
+    def saturated(cls) -> bool:
+        # admit() would reject right now
+        return not (cls._active < LLM_CONCURRENCY and not cls._waiting) and cls._waiting >= LLM_QUEUE_SIZE
+
+    @classmethod
+    def check(cls):
+        # Rejects up front a request known to need a new generation, before
+        # the caller stores or streams anything
+        if cls.saturated():
+            cls.rejected += 1
+            raise QueueFull(cls.retry_after())
+
+    @classmethod
+    def admit(cls, owner: str) -> Ticket:
+        ticket = Ticket(owner)
+        if cls._active < LLM_CONCURRENCY and not cls._waiting:
+            cls._grant(ticket)
+        elif cls.saturated():
+            cls.rejected += 1
+            raise QueueFull(cls.retry_after())
+        else:
+            cls._queues.setdefault(owner, deque()).append(ticket)
+            cls._waiting += 1
+            cls.max_depth = max(cls.max_depth, cls._waiting)
+            cls._notify()
+        cls.admitted += 1
+        return ticket
+
+    @classmethod
+    def _grant(cls, ticket: Ticket):
+        ticket.granted = True
+        ticket.started_at = time.monotonic()
+        cls._active += 1
+        cls._waits.append(ticket.started_at - ticket.enqueued_at)
+        ticket._event.set()
+
+    @classmethod
+    def _dispatch(cls):
+        while cls._active < LLM_CONCURRENCY and cls._queues:
+            owner, queue = next(iter(cls._queues.items()))
+            ticket = queue.popleft()
+            cls._waiting -= 1
+            if queue:
+                cls._queues.move_to_end(owner)
+            else:
+                del cls._queues[owner]
+            cls._grant(ticket)
+        cls._notify()
+
+    @classmethod
+    def release(cls, ticket: Ticket):
+        # Finished, failed or abandoned; safe to call more than once
+        if ticket.closed:
+            return
+        ticket.closed = True
+        if ticket.granted:
+            cls._active -= 1
+            cls.completed += 1
+            cls._durations.append(time.monotonic() - ticket.started_at)
+        else:
+            queue = cls._queues.get(ticket.owner)
+            if queue is not None and ticket in queue:
+                queue.remove(ticket)
+                cls._waiting -= 1
+                if not queue:
+                    del cls._queues[ticket.owner]
+        cls._dispatch()
+
+    @classmethod
+    def position(cls, ticket: Ticket) -> int:
+        # 1-based place in line under round-robin: each owner ahead in the
+        # rotation gets one more turn than those behind
+        if ticket.granted or ticket.closed:
+            return 0
+        owners = list(cls._queues)
+        index = cls._queues[ticket.owner].index(ticket)
+        rank = owners.index(ticket.owner)
+        ahead = 0
+        for i, owner in enumerate(owners):
+            turns = index + 1 if i < rank else index
+            ahead += min(len(cls._queues[owner]), turns)
+        return ahead + 1
+
+    @classmethod
+    async def positions(cls, ticket: Ticket):
+        # Yields the ticket's place in line whenever it changes, until granted
+        last = None
+        while not ticket.granted and not ticket.closed:
+            current = cls.position(ticket)
+            if current != last:
+                yield current
+                last = current
+            if cls._changed is None:
+                cls._changed = asyncio.Event()
+            await cls._changed.wait()
+
+    @classmethod
+    async def run(cls, ticket: Ticket, source_factory):
+        # Waits for the ticket's slot, then streams; the slot is freed when
+        # the stream ends, fails or is cancelled
+        try:
+            await ticket._event.wait()
+            async for token in source_factory():
+                yield token
+        finally:
+            cls.release(ticket)
+
+    @classmethod
+    def schedule(cls, owner: str, source_factory):
+        # Returns (token source, ticket); raises QueueFull
+        ticket = cls.admit(owner)
+        return cls.run(ticket, source_factory), ticket
+
+    @classmethod
+    @asynccontextmanager
+    async def slot(cls, owner: str):
+        # For non-streaming calls (e.g. summaries)
+        ticket = cls.admit(owner)
+        try:
+            await ticket._event.wait()
+            yield
+        finally:
+            cls.release(ticket)
+
+    @classmethod
+    def stats(cls):
+        waits = sorted(cls._waits)
+
+        def wait_ms(q):
+            return round(waits[min(len(waits) - 1, int(len(waits) * q))] * 1000, 1) if waits else 0
+
+        return {
+            "concurrency": LLM_CONCURRENCY,
+            "active": cls._active,
+            "queued": cls._waiting,
+            "queue_size": LLM_QUEUE_SIZE,
+            "max_queue_depth": cls.max_depth,
+            "waiting_owners": len(cls._queues),
+            "admitted": cls.admitted,
+            "rejected": cls.rejected,
+            "completed": cls.completed,
+            "wait_ms_p50": wait_ms(0.5),
+            "wait_ms_p95": wait_ms(0.95),
+            "wait_ms_max": round(waits[-1] * 1000, 1) if waits else 0,
+        }
@@ -0,0 +1,102 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from services.retrieval_service import RetrievalCache, normalize_question
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Off by default: retrieval then returns its top k directly
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+RERANK_MODEL_NAME = os.getenv("RERANK_MODEL_NAME", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", 30))
+# Hard per-request limit; past it the answer uses retrieval order instead
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", 150))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", 20000))
+RERANK_CACHE_TTL = float(os.getenv("RERANK_CACHE_TTL", 86400))
+
+
+class RerankService:
+    # One cross-encoder forward pass over every uncached (query, chunk) pair.
+    # Passes run one at a time on a dedicated thread so they never pile up
+    # in the request threadpool; a pass whose request already gave up is
+    # skipped. Chunk ids are content hashes, so cached scores stay valid
+    # across index snapshots.
+
+    cache = RetrievalCache(RERANK_CACHE_SIZE, RERANK_CACHE_TTL)
+
+    _model = None
+    _load_lock = threading.Lock()
+    _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+
+    reranked = 0
+    timeouts = 0
+    skipped = 0
+
+    @classmethod
+    def model(cls):
+        if cls._model is None:
+            with cls._load_lock:
+                if cls._model is None:
+                    from sentence_transformers import CrossEncoder
+
+                    cls._model = CrossEncoder(RERANK_MODEL_NAME)
+        return cls._model
+
+    @classmethod
+    def _score(cls, query: str, docs, deadline: float):
+        key = normalize_question(query)
+        scores = [cls.cache.get((key, doc.metadata["chunk_id"])) for doc in docs]
+        missing = [i for i, score in enumerate(scores) if score is None]
+
+        if missing:
+            if time.monotonic() > deadline:
+                cls.skipped += 1
+                return None
+
+            pairs = [(query, docs[i].page_content) for i in missing]
+            predicted = cls.model().predict(pairs, batch_size=len(pairs))
+            for i, score in zip(missing, predicted):
+                scores[i] = float(score)
+                cls.cache.put((key, docs[i].metadata["chunk_id"]), scores[i])
+
+        return scores
+
+    @classmethod
+    async def rerank(cls, query: str, docs, k: int):
+        # Returns the k best docs by cross-encoder score, or the first k in
+        # retrieval order when the budget runs out
+        if len(docs) <= 1:
+            return docs[:k]
+
+        budget = RERANK_BUDGET_MS / 1000
+        deadline = time.monotonic() + budget
+        loop = asyncio.get_running_loop()
+        try:
+            scores = await asyncio.wait_for(
+                loop.run_in_executor(cls._executor, cls._score, query, docs, deadline),
+                timeout=budget,
+            )
+        except asyncio.TimeoutError:
+            # The pass keeps running and still fills the score cache
+            cls.timeouts += 1
+            return docs[:k]
+
+        if scores is None:
+            return docs[:k]
+
+        cls.reranked += 1
+        order = sorted(range(len(docs)), key=lambda i: scores[i], reverse=True)
+        return [docs[i] for i in order[:k]]
+
+    @classmethod
+    def stats(cls):
+        return {
+            "enabled": RERANK_ENABLED,
+            "reranked": cls.reranked,
+            "timeouts": cls.timeouts,
+            "skipped_passes": cls.skipped,
+            "score_cache": cls.cache.stats(),
+        }
@@ -0,0 +1,155 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from services.index_store import IndexStore
+from services.embedding_service import embedding_engine
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", 1024))
+RETRIEVAL_CACHE_TTL = float(os.getenv("RETRIEVAL_CACHE_TTL", 3600))
+# BM25 + vector candidates merged with reciprocal-rank fusion
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", 20))
+RRF_K = int(os.getenv("RRF_K", 60))
+
+
+def normalize_question(text: str) -> str:
+    # "What are your hours?" and "what are  your hours" share a cache entry
+    text = re.sub(r"\s+", " ", text.strip().lower())
+    return text.rstrip("?!. ")
+
+
+def reciprocal_rank_fusion(rankings, k: int = RRF_K):
+    # Only ranks matter, so BM25 and L2 scores never need to be comparable
+    scores = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class RetrievalCache:
+    # Bounded LRU with a per-entry TTL. Values are (query_vector, chunk_ids).
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class RetrievalResult:
+    def __init__(self, docs, chunk_ids, vector, generation: int):
+        self.docs = docs
+        self.chunk_ids = chunk_ids
+        self.vector = vector
+        self.generation = generation
+
+    def with_docs(self, docs):
+        # Same query, narrowed or reordered context (e.g. after reranking)
+        return RetrievalResult(
+            docs, [doc.metadata["chunk_id"] for doc in docs], self.vector, self.generation
+        )
+
+    @property
+    def context_key(self) -> str:
+        # Identifies "the same retrieved context" independent of the question
+        joined = "\x1f".join(self.chunk_ids)
+        return hashlib.sha1(f"{self.generation}:{joined}".encode()).hexdigest()
+
+
+class RetrievalService:
+
+    cache = RetrievalCache(RETRIEVAL_CACHE_SIZE, RETRIEVAL_CACHE_TTL)
+
+    @staticmethod
+    def _search(vector_index, message: str, vector, k: int, file_ids=None):
+        if not HYBRID_SEARCH:
+            return vector_index.search(vector, k, file_ids)
+
+        # Exact terms (product codes, error numbers, names) that MiniLM
+        # embeds poorly still rank through BM25
+        candidates = max(k, HYBRID_CANDIDATES)
+        dense = vector_index.search(vector, candidates, file_ids)
+        lexical = vector_index.lexical_search(message, candidates, file_ids)
+        return reciprocal_rank_fusion([dense, lexical])[:k]
+
+    @classmethod
+    def retrieve(cls, message: str, k: int = 3, file_ids=None):
+        # Blocking (embedding + FAISS); call it from a worker thread.
+        # Returns None when no knowledge base has been built yet.
+        # file_ids limits the search to those documents.
+        snapshot = IndexStore.current()
+        if snapshot is None:
+            return None
+
+        vector_index = snapshot.vector_index
+        scope = tuple(sorted(file_ids)) if file_ids is not None else None
+        key = (normalize_question(message), snapshot.generation, k, scope)
+
+        cached = cls.cache.get(key)
+        if cached is not None:
+            vector, ids = cached
+        else:
+            vector = embedding_engine.embed_query(message)
+            ids = cls._search(vector_index, message, vector, k, file_ids)
+            cls.cache.put(key, (vector, ids))
+
+        docs = vector_index.fetch(ids)
+        chunk_ids = [doc.metadata["chunk_id"] for doc in docs]
+        return RetrievalResult(docs, chunk_ids, vector, snapshot.generation)
+
+
+# A new index makes every cached chunk list stale
+IndexStore.on_publish(lambda snapshot: RetrievalService.cache.clear())
@@ -0,0 +1,151 @@
+import asyncio
+import hashlib
+import os
+from services.llm_scheduler import LLMScheduler
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+
+
+class SharedGeneration:
+    # One LLM stream fanned out to every request with the same prompt. A
+    # background task drives the source and appends to `tokens`; subscribers
+    # replay what is there, then wait for more. The task is cancelled once
+    # the last subscriber leaves.
+
+    def __init__(self, key: str, source, ticket=None):
+        self.key = key
+        self.ticket = ticket  # scheduler slot the source waits for, if any
+        self.tokens = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._drive(source))
+
+    def _notify(self):
+        self._wakeup.set()
+        self._wakeup = asyncio.Event()
+
+    async def _drive(self, source):
+        try:
+            async for token in source:
+                self.tokens.append(token)
+                self._notify()
+        except asyncio.CancelledError:
+            self.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            SingleFlight.finished(self)
+            self._notify()
+
+    def follow(self):
+        # Counted from the moment a request joins, not from its first read,
+        # so a subscriber that has yet to start keeps the stream alive
+        return Subscription(self)
+
+    def cancel(self):
+        # Nobody is listening: stop generating, free the scheduler slot now
+        # (the task may not have started yet) and let the next identical
+        # question start afresh
+        SingleFlight.finished(self)
+        self._task.cancel()
+        if self.ticket is not None:
+            LLMScheduler.release(self.ticket)
+
+
+class Subscription:
+    # One request's view of a SharedGeneration. close() is synchronous and
+    # idempotent so it also works from a cancelled or finalizing stream.
+
+    def __init__(self, shared: SharedGeneration):
+        self.shared = shared
+        self.closed = False
+        shared.subscribers += 1
+
+    def __aiter__(self):
+        return self._follow()
+
+    async def _follow(self):
+        shared = self.shared
+        try:
+            position = 0
+            while True:
+                wakeup = shared._wakeup
+                while position < len(shared.tokens):
+                    yield shared.tokens[position]
+                    position += 1
+                if shared.done:
+                    if shared.error is not None:
+                        raise shared.error
+                    return
+                await wakeup.wait()
+        finally:
+            self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.shared.subscribers -= 1
+        if self.shared.subscribers == 0 and not self.shared.done:
+            self.shared.cancel()
+
+
+class SingleFlight:
+    # In-flight generations by prompt and index generation. Identical
+    # questions arriving while an answer is being generated attach to it
+    # instead of starting their own; once it finishes the key is free again.
+
+    _inflight = {}
+
+    started = 0
+    coalesced = 0
+
+    @staticmethod
+    def key(prompt: str, generation: int) -> str:
+        return hashlib.sha256(f"{generation}:{prompt}".encode()).hexdigest()
+
+    @classmethod
+    def join(cls, key: str, start, share: bool = True):
+        # Returns (generation, leader); leader is True for the request whose
+        # call started it. start() -> (token source, scheduler ticket) is
+        # only called when nothing identical is running. With share=False
+        # the generation is private to the caller.
+        shared = cls._inflight.get(key) if share else None
+        if shared is not None and not shared.done:
+            cls.coalesced += 1
+            return shared, False
+
+        source, ticket = start()
+        shared = SharedGeneration(key, source, ticket)
+        if share:
+            cls._inflight[key] = shared
+            cls.started += 1
+        return shared, True
+
+    @classmethod
+    def running(cls, key: str) -> bool:
+        # join() would attach to an existing generation
+        shared = cls._inflight.get(key)
+        return shared is not None and not shared.done
+
+    @classmethod
+    def finished(cls, shared: SharedGeneration):
+        if cls._inflight.get(shared.key) is shared:
+            del cls._inflight[shared.key]
+
+    @classmethod
+    def stats(cls):
+        return {
+            "enabled": SINGLE_FLIGHT_ENABLED,
+            "in_flight": len(cls._inflight),
+            "started": cls.started,
+            "coalesced": cls.coalesced,
+            "subscribers": sum(s.subscribers for s in cls._inflight.values()),
+        }
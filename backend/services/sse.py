@@ -0,0 +1,253 @@
+import asyncio
+import json
+import os
+import re
+import time
+import uuid
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# How often an open stream checks whether its client is still there
+SSE_DISCONNECT_CHECK = float(os.getenv("SSE_DISCONNECT_CHECK", 0.25))
+# Tokens are sent together once this window has passed since the first
+# unsent one, or earlier when this many bytes are waiting
+SSE_BATCH_MS = float(os.getenv("SSE_BATCH_MS", 25))
+SSE_BATCH_BYTES = int(os.getenv("SSE_BATCH_BYTES", 1024))
+# Comment line sent when nothing else went out for this long (proxies
+# close idle connections; retrieval or the queue can take a while)
+SSE_HEARTBEAT = float(os.getenv("SSE_HEARTBEAT", 10))
+# Finished streams kept for Last-Event-ID resume
+SSE_RESUME_TTL = float(os.getenv("SSE_RESUME_TTL", 60))
+SSE_RESUME_STREAMS = int(os.getenv("SSE_RESUME_STREAMS", 256))
+# Seconds an answer keeps generating with no client attached, waiting for
+# a resume; 0 stops it as soon as the disconnect is seen
+SSE_RESUME_GRACE = float(os.getenv("SSE_RESUME_GRACE", 0))
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # nginx: do not buffer the stream
+}
+
+
+def sse_headers(stream):
+    # Event ids are sequence numbers within the stream; resuming takes the
+    # stream id (this header) plus Last-Event-ID
+    return {**SSE_HEADERS, "X-Stream-Id": stream.id}
+
+
+_LINE_BREAK = re.compile(r"\r\n|\r|\n")
+
+
+def sse_event(data: str, event: str = None, event_id: str = None) -> str:
+    # One Server-Sent Event; multi-line data goes out as several data:
+    # lines, which the client joins back with "\n"
+    lines = [f"id: {event_id}"] if event_id else []
+    if event:
+        lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in _LINE_BREAK.split(data))
+    return "\n".join(lines) + "\n\n"
+
+
+class SSEStream:
+    # One answer's events. A producer task turns the item source into
+    # framed events (str items are tokens and get batched, (event, payload)
+    # tuples become named events) and buffers them; each connection replays
+    # the buffer from its last event id and then follows live. The producer
+    # is cancelled when no connection is left (after SSE_RESUME_GRACE). A
+    # final "done" event tells whether the source ran to the end.
+
+    def __init__(self, items):
+        self.id = uuid.uuid4().hex[:16]
+        self.events = []  # encoded; events[n] has id n + 1
+        self.done = False
+        self.finished_at = None
+        self.listeners = 0
+        self._grace = None
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._produce(items))
+        self._task.add_done_callback(self._finished)
+
+    def _notify(self):
+        self._wakeup.set()
+        self._wakeup = asyncio.Event()
+
+    def _append(self, data: str, event: str = None):
+        self.events.append(sse_event(data, event, str(len(self.events) + 1)).encode())
+        self._notify()
+
+    async def _produce(self, items):
+        batch, size, deadline = [], 0, None
+        pending = None
+        complete = False
+
+        def flush():
+            nonlocal batch, size, deadline
+            if batch:
+                self._append("".join(batch))
+            batch, size, deadline = [], 0, None
+
+        try:
+            while True:
+                pending = asyncio.ensure_future(items.__anext__())
+                if deadline is not None:
+                    await asyncio.wait({pending}, timeout=max(0.0, deadline - time.monotonic()))
+                    if not pending.done():
+                        flush()  # window over while the next token is still coming
+                try:
+                    item = await pending
+                except StopAsyncIteration:
+                    break
+                pending = None
+
+                if isinstance(item, str):
+                    batch.append(item)
+                    size += len(item)
+                    if deadline is None:
+                        deadline = time.monotonic() + SSE_BATCH_MS / 1000
+                    if size >= SSE_BATCH_BYTES:
+                        flush()
+                else:
+                    flush()
+                    event, payload = item
+                    self._append(json.dumps(payload), event)
+            complete = True
+        finally:
+            if pending is not None and not pending.done():
+                # Let the source run its own cleanup (e.g. saving a
+                # truncated answer) before the stream counts as done
+                pending.cancel()
+                await asyncio.gather(pending, return_exceptions=True)
+            # A source cancelled between items is closed here, not by the GC
+            await items.aclose()
+            # Always the last event, also when cancelled with nobody
+            # attached: a resume then shows the answer was cut short
+            flush()
+            self._append(json.dumps({"truncated": not complete}), "done")
+
+    def _finished(self, task):
+        # Also reached when the task was cancelled before it started
+        self.done = True
+        self.finished_at = time.monotonic()
+        self._notify()
+
+    def cancel(self):
+        if not self.done:
+            self._task.cancel()
+
+    def _expire(self):
+        self._grace = None
+        if self.listeners == 0:
+            self.cancel()
+
+    async def follow(self, request=None, after: int = 0):
+        # One connection: buffered events after `after`, then live ones;
+        # heartbeats while idle, disconnect checks throughout
+        self.listeners += 1
+        if self._grace is not None:
+            self._grace.cancel()
+            self._grace = None
+        SSEStreams.connections += 1
+
+        position = max(0, min(after, len(self.events)))
+        now = time.monotonic()
+        next_check = now + SSE_DISCONNECT_CHECK
+        last_write = now
+        try:
+            # Headers reach the client (through any proxy) before retrieval
+            # has finished
+            yield self._write(b": connected\n\n")
+
+            while True:
+                if position < len(self.events):
+                    # Everything produced since the last write goes out at once
+                    chunk = b"".join(self.events[position:])
+                    position = len(self.events)
+                    yield self._write(chunk)
+                    last_write = time.monotonic()
+                elif self.done:
+                    return
+                else:
+                    wakeup = self._wakeup
+                    timeout = min(next_check, last_write + SSE_HEARTBEAT) - time.monotonic()
+                    try:
+                        await asyncio.wait_for(wakeup.wait(), timeout=max(0.0, timeout))
+                    except asyncio.TimeoutError:
+                        pass
+
+                now = time.monotonic()
+                if request is not None and now >= next_check:
+                    next_check = now + SSE_DISCONNECT_CHECK
+                    if await request.is_disconnected():
+                        SSEStreams.disconnects += 1
+                        return
+                if now - last_write >= SSE_HEARTBEAT and position == len(self.events):
+                    SSEStreams.heartbeats += 1
+                    yield self._write(b": ping\n\n")
+                    last_write = now
+        finally:
+            # Synchronous on purpose: also runs when the server cancels us
+            self.listeners -= 1
+            if self.listeners == 0 and not self.done:
+                if SSE_RESUME_GRACE > 0:
+                    self._grace = asyncio.get_running_loop().call_later(SSE_RESUME_GRACE, self._expire)
+                else:
+                    self.cancel()
+
+    @staticmethod
+    def _write(chunk: bytes) -> bytes:
+        SSEStreams.writes += 1
+        SSEStreams.bytes_sent += len(chunk)
+        return chunk
+
+
+class SSEStreams:
+    # Live and recently finished streams by id, for Last-Event-ID resume
+
+    _streams = OrderedDict()
+
+    connections = 0
+    resumes = 0
+    disconnects = 0
+    writes = 0
+    bytes_sent = 0
+    heartbeats = 0
+
+    @classmethod
+    def open(cls, items) -> SSEStream:
+        cls._prune()
+        stream = SSEStream(items)
+        cls._streams[stream.id] = stream
+        return stream
+
+    @classmethod
+    def _prune(cls):
+        now = time.monotonic()
+        finished = [s for s in cls._streams.values() if s.done]
+        excess = len(cls._streams) - SSE_RESUME_STREAMS + 1
+        for stream in finished:
+            if now - stream.finished_at > SSE_RESUME_TTL or excess > 0:
+                del cls._streams[stream.id]
+                excess -= 1
+
+    @classmethod
+    def get(cls, stream_id: str):
+        # None once the stream has expired
+        stream = cls._streams.get(stream_id)
+        if stream is not None:
+            cls.resumes += 1
+        return stream
+
+    @classmethod
+    def stats(cls):
+        return {
+            "streams": len(cls._streams),
+            "live": sum(not s.done for s in cls._streams.values()),
+            "connections": cls.connections,
+            "resumes": cls.resumes,
+            "disconnects": cls.disconnects,
+            "writes": cls.writes,
+            "bytes_sent": cls.bytes_sent,
+            "heartbeats": cls.heartbeats,
+        }
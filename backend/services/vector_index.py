@@ -0,0 +1,383 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+from pathlib import Path
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from services import ann_index
+from services.lexical_index import LexicalIndex, create_tables
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Map the vector data instead of reading it: loads are near-instant and
+# every worker process shares the same pages through the OS page cache
+INDEX_MMAP = os.getenv("INDEX_MMAP", "true").lower() == "true"
+# Indexes that cannot remove vectors (HNSW) are rebuilt from their stored
+# vectors once this share of them belongs to deleted documents
+INDEX_COMPACT_RATIO = float(os.getenv("INDEX_COMPACT_RATIO", 0.2))
+
+_UUID_LENGTH = 36
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.strip().encode("utf-8")).hexdigest()
+
+
+def file_id_from_source(source: str):
+    # Uploads are stored as "<ChatbotFile.id>_<filename>"
+    if source and len(source) > _UUID_LENGTH and source[_UUID_LENGTH] == "_":
+        return source[:_UUID_LENGTH]
+    return None
+
+
+def _read_flags():
+    if not INDEX_MMAP:
+        return 0
+    # IO_FLAG_MMAP_IFC also maps flat codes (faiss >= 1.10); older builds
+    # can only map IVF inverted lists
+    return getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+
+class VectorIndex:
+    # One snapshot directory: a FAISS index keyed by chunk id (IndexIDMap2)
+    # and a SQLite file holding each chunk's text, content hash and source,
+    # the documents (ChatbotFile ids) each chunk appears in, and the BM25
+    # inverted index over the same chunk ids.
+    # Text is fetched by id for the handful of hits a query returns, so
+    # nothing is unpickled and nothing but the id map lives on the heap.
+
+    INDEX_FILE = "index.faiss"
+    CHUNKS_FILE = "chunks.sqlite"
+
+    def __init__(self, path: Path, index=None, writable: bool = False):
+        self.path = Path(path)
+        self.index = index
+        self.writable = writable
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending = []  # (ids, vectors) waiting for index training
+        self._deleted = None
+        self.changed = False  # anything to publish
+        self.lexical = LexicalIndex(self._reader)
+
+        if writable:
+            self._db = sqlite3.connect(str(self.path / self.CHUNKS_FILE), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                " id INTEGER PRIMARY KEY,"
+                " hash TEXT NOT NULL UNIQUE,"
+                " source TEXT,"
+                " text TEXT NOT NULL)"
+            )
+            # A chunk shared by several documents is stored and embedded once
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS chunk_files ("
+                " chunk_id INTEGER NOT NULL,"
+                " file_id TEXT NOT NULL,"
+                " PRIMARY KEY (chunk_id, file_id)) WITHOUT ROWID"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS chunk_files_file ON chunk_files (file_id)")
+            # Vectors of deleted chunks in indexes that cannot remove them
+            self._db.execute("CREATE TABLE IF NOT EXISTS tombstones (chunk_id INTEGER PRIMARY KEY)")
+            create_tables(self._db)
+            self._backfill_files()
+            if LexicalIndex.needs_backfill(self._db):
+                rows = self._db.execute("SELECT id, text FROM chunks ORDER BY id")
+                while batch := rows.fetchmany(1000):
+                    self.lexical.add(self._db, [row[0] for row in batch], [row[1] for row in batch])
+
+    # ---------- opening ----------
+
+    @classmethod
+    def exists(cls, path: Path):
+        path = Path(path)
+        return (path / cls.INDEX_FILE).exists() and (path / cls.CHUNKS_FILE).exists()
+
+    @classmethod
+    def open(cls, path: Path):
+        # Read-only view of a published snapshot
+        index = faiss.read_index(str(Path(path) / cls.INDEX_FILE), _read_flags())
+        ann_index.apply_search_params(index)
+        return cls(path, index)
+
+    @classmethod
+    def open_for_update(cls, path, staging: Path):
+        # Copy-on-write: the published snapshot is never touched. Chunk rows
+        # are copied into the staging directory and the index is read fully
+        # into memory so new vectors can be added to it.
+        index = None
+        if path is not None:
+            shutil.copyfile(Path(path) / cls.CHUNKS_FILE, Path(staging) / cls.CHUNKS_FILE)
+            index = faiss.read_index(str(Path(path) / cls.INDEX_FILE))
+        return cls(staging, index, writable=True)
+
+    # ---------- reads ----------
+
+    def _reader(self):
+        # One connection per thread; immutable=1 skips locking since a
+        # published snapshot never changes
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            uri = (self.path / self.CHUNKS_FILE).resolve().as_uri() + "?mode=ro&immutable=1"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    @property
+    def ntotal(self):
+        return self.index.ntotal if self.index is not None else 0
+
+    def _tombstones(self):
+        if self._deleted is None:
+            try:
+                rows = self._reader().execute("SELECT chunk_id FROM tombstones").fetchall()
+            except sqlite3.OperationalError:
+                rows = []  # snapshot older than document deletion
+            self._deleted = np.array([row[0] for row in rows], dtype=np.int64)
+        return self._deleted
+
+    def chunk_ids_for(self, file_ids):
+        try:
+            rows = self._reader().execute(
+                "SELECT DISTINCT chunk_id FROM chunk_files"
+                " WHERE file_id IN (SELECT value FROM json_each(?))",
+                (json.dumps(list(file_ids)),),
+            ).fetchall()
+        except sqlite3.OperationalError:
+            rows = []
+        return np.array(sorted(row[0] for row in rows), dtype=np.int64)
+
+    def search(self, vector, k: int, file_ids=None):
+        # file_ids restricts results to those documents
+        if not self.ntotal:
+            return []
+
+        selector = None
+        if file_ids is not None:
+            allowed = self.chunk_ids_for(file_ids)
+            if not len(allowed):
+                return []
+            selector = faiss.IDSelectorBatch(allowed)
+        elif len(self._tombstones()):
+            deleted = faiss.IDSelectorBatch(self._tombstones())
+            selector = faiss.IDSelectorNot(deleted)
+
+        params = ann_index.search_parameters(self.index, selector) if selector else None
+        query = np.array([vector], dtype=np.float32)
+        _, ids = self.index.search(query, k, params=params)
+        return [int(i) for i in ids[0] if i != -1]
+
+    def lexical_search(self, query: str, k: int, file_ids=None):
+        if file_ids is None:
+            return self.lexical.search(query, k)
+        allowed = self.chunk_ids_for(file_ids)
+        return self.lexical.search(query, k, allowed) if len(allowed) else []
+
+    def fetch(self, ids):
+        # Documents in the order of ids; ids missing from the table are skipped
+        if not ids:
+            return []
+        placeholders = ",".join("?" * len(ids))
+        rows = self._reader().execute(
+            f"SELECT id, hash, source, text FROM chunks WHERE id IN ({placeholders})", ids
+        ).fetchall()
+        by_id = {row[0]: row for row in rows}
+        return [
+            Document(
+                page_content=by_id[i][3],
+                metadata={"source": by_id[i][2], "chunk_id": by_id[i][1], "index_id": i},
+            )
+            for i in ids if i in by_id
+        ]
+
+    # ---------- writes (staging copies only) ----------
+
+    def _backfill_files(self):
+        # Snapshots from before multi-document support: recover each chunk's
+        # document from its source name
+        if self._db.execute("SELECT 1 FROM chunk_files LIMIT 1").fetchone() is not None:
+            return
+        rows = self._db.execute("SELECT id, source FROM chunks").fetchall()
+        self._db.executemany(
+            "INSERT OR IGNORE INTO chunk_files (chunk_id, file_id) VALUES (?, ?)",
+            [(row[0], file_id_from_source(row[1])) for row in rows if file_id_from_source(row[1])],
+        )
+
+    def link(self, hash_: str, file_id: str = None) -> bool:
+        # Tags an already stored chunk with another document; False when the
+        # chunk is new and still has to be embedded
+        with self._lock:
+            row = self._db.execute("SELECT id FROM chunks WHERE hash = ?", (hash_,)).fetchone()
+            if row is not None and file_id:
+                inserted = self._db.execute(
+                    "INSERT OR IGNORE INTO chunk_files (chunk_id, file_id) VALUES (?, ?)",
+                    (row[0], file_id),
+                ).rowcount
+                self.changed = self.changed or inserted > 0
+            return row is not None
+
+    def __contains__(self, hash_: str):
+        with self._lock:
+            return self._db.execute(
+                "SELECT 1 FROM chunks WHERE hash = ?", (hash_,)
+            ).fetchone() is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def filter_new(self, chunks, file_id: str = None):
+        # Returns (hashes, texts) for chunks not embedded yet, also dropping
+        # repeats inside the same document. Known chunks get tagged with file_id.
+        hashes, texts = [], []
+        seen = set()
+        for chunk in chunks:
+            h = chunk_hash(chunk)
+            if h in seen or self.link(h, file_id):
+                continue
+            seen.add(h)
+            hashes.append(h)
+            texts.append(chunk)
+        return hashes, texts
+
+    def add(self, texts, vectors, hashes, source: str = None, file_id: str = None):
+        with self._lock:
+            # Ids of tombstoned vectors are never handed out again
+            start = self._db.execute(
+                "SELECT MAX(COALESCE((SELECT MAX(id) FROM chunks), -1),"
+                " COALESCE((SELECT MAX(chunk_id) FROM tombstones), -1)) + 1"
+            ).fetchone()[0]
+            ids = np.arange(start, start + len(texts), dtype=np.int64)
+            self.changed = True
+            self._db.executemany(
+                "INSERT INTO chunks (id, hash, source, text) VALUES (?, ?, ?, ?)",
+                [(int(i), h, source, t) for i, h, t in zip(ids, hashes, texts)],
+            )
+            if file_id:
+                self._db.executemany(
+                    "INSERT INTO chunk_files (chunk_id, file_id) VALUES (?, ?)",
+                    [(int(i), file_id) for i in ids],
+                )
+            self.lexical.add(self._db, ids, texts)
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.index is None:
+            # A new index of a trained type waits for enough vectors
+            self._pending.append((ids, vectors))
+            buffered = sum(len(batch[0]) for batch in self._pending)
+            if not ann_index.needs_training() or buffered >= ann_index.ANN_TRAIN_SAMPLE:
+                self._create_index()
+        else:
+            self.index.add_with_ids(vectors, ids)
+
+    def remove_file(self, file_id: str) -> int:
+        # Drops one document: its links, and every chunk no other document
+        # still contains. Work is proportional to that document's chunks.
+        with self._lock:
+            ids = [row[0] for row in self._db.execute(
+                "SELECT chunk_id FROM chunk_files WHERE file_id = ?", (file_id,)
+            )]
+            self._db.execute("DELETE FROM chunk_files WHERE file_id = ?", (file_id,))
+            if not ids:
+                return 0
+            self.changed = True
+
+            id_list = (json.dumps(ids),)
+            shared = {row[0] for row in self._db.execute(
+                "SELECT DISTINCT chunk_id FROM chunk_files"
+                " WHERE chunk_id IN (SELECT value FROM json_each(?))", id_list
+            )}
+            orphans = [i for i in ids if i not in shared]
+            if not orphans:
+                return 0
+
+            id_list = (json.dumps(orphans),)
+            texts = [row[0] for row in self._db.execute(
+                "SELECT text FROM chunks WHERE id IN (SELECT value FROM json_each(?))", id_list
+            )]
+            self._db.execute("DELETE FROM chunks WHERE id IN (SELECT value FROM json_each(?))", id_list)
+            self.lexical.remove(self._db, orphans, texts)
+
+            removed = np.array(orphans, dtype=np.int64)
+            if ann_index.supports_remove(self.index):
+                self.index.remove_ids(faiss.IDSelectorBatch(removed))
+            else:
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO tombstones (chunk_id) VALUES (?)",
+                    [(i,) for i in orphans],
+                )
+                self._compact_if_needed()
+
+        return len(orphans)
+
+    def _compact_if_needed(self):
+        deleted = self._tombstone_ids()
+        if len(deleted) > INDEX_COMPACT_RATIO * self.index.ntotal:
+            self._rebuild(deleted)
+
+    def _tombstone_ids(self):
+        return np.array(
+            [row[0] for row in self._db.execute("SELECT chunk_id FROM tombstones")], dtype=np.int64
+        )
+
+    def _rebuild(self, deleted):
+        # New index of the configured type from the stored vectors, without
+        # the tombstoned ones. PQ indexes only hold approximations, so a
+        # rebuilt ivf_pq is trained on those.
+        ids, vectors = ann_index.stored_vectors(self.index)
+        keep = ~np.isin(ids, deleted)
+        self.index = ann_index.build_index(ids[keep], vectors[keep])
+        self._db.execute("DELETE FROM tombstones")
+
+    def _create_index(self):
+        ids = np.concatenate([batch[0] for batch in self._pending])
+        vectors = np.concatenate([batch[1] for batch in self._pending])
+        self._pending = []
+        self.index = ann_index.build_index(ids, vectors)
+
+    def save(self):
+        if self.index is None and self._pending:
+            self._create_index()
+        elif self.changed and self.index is not None and ann_index.needs_rebuild(self.index):
+            # Trained on a much smaller corpus, or not of INDEX_TYPE (yet)
+            print(f"Rebuilding {ann_index.describe(self.index)} ({self.ntotal} vectors) as {ann_index.INDEX_TYPE}")
+            with self._lock:
+                self._rebuild(self._tombstone_ids())
+        with self._lock:
+            self.lexical.flush(self._db)
+            self._db.commit()
+            self._db.close()
+        faiss.write_index(self.index, str(self.path / self.INDEX_FILE))
+
+    def discard(self):
+        if self.writable:
+            with self._lock:
+                self._db.close()
+
+    # ---------- migration ----------
+
+    @classmethod
+    def from_langchain(cls, vector_store, staging: Path):
+        # Converts a pickled langchain FAISS store (how indexes used to be saved)
+        writable = cls(staging, writable=True)
+        # FAISS positions become chunk ids
+        rows = []
+        for position, doc_id in vector_store.index_to_docstore_id.items():
+            doc = vector_store.docstore.search(doc_id)
+            if isinstance(doc, Document):
+                rows.append((position, chunk_hash(doc.page_content), doc.metadata.get("source"), doc.page_content))
+
+        with writable._lock:
+            writable._db.executemany(
+                "INSERT OR IGNORE INTO chunks (id, hash, source, text) VALUES (?, ?, ?, ?)", rows
+            )
+            writable.lexical.add(writable._db, [row[0] for row in rows], [row[3] for row in rows])
+
+        ids, vectors = ann_index.stored_vectors(vector_store.index)
+        writable.index = ann_index.build_index(ids, vectors)
+        return writable
@@ -1,21 +1,10 @@
 import time
 from pathlib import Path
-from langchain_community.vectorstores import FAISS
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from PyPDF2 import PdfReader
-import docx
-import threading
-
-BASE_DIR = Path(__file__).resolve().parent.parent
-VECTOR_STORE_PATH = BASE_DIR / "vector_store"
-FAISS_INDEX_PATH = VECTOR_STORE_PATH / "faiss_index"
-
-VECTOR_STORE_PATH.mkdir(exist_ok=True)
-
-embeddings_model = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-MiniLM-L6-v2"
-)
+from services.index_store import IndexStore
+from services.vector_index import VectorIndex
+from services.document_reader import count_units
+from services.ingestion_pipeline import IngestionPipeline, IngestionCancelled
 
 text_splitter = RecursiveCharacterTextSplitter(
     chunk_size=500,
@@ -24,113 +13,90 @@ text_splitter = RecursiveCharacterTextSplitter(
 
 class VectorService:
 
-    progress = 0
-    status = "idle"
-    time_taken = 0
-    cancelled = False
-    cancel_event = threading.Event()
-    was_cancelled = False
-
-
     @staticmethod
-    def read_file(file_path: Path):
-        text = ""
-
-        if file_path.suffix.lower() == ".txt":
-            text = file_path.read_text(encoding="utf-8", errors="ignore")
-
-        elif file_path.suffix.lower() == ".pdf":
-            reader = PdfReader(str(file_path))
-            for page in reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-
-        elif file_path.suffix.lower() == ".docx":
-            doc = docx.Document(str(file_path))
-            for para in doc.paragraphs:
-                text += para.text + "\n"
-
-        return text
-
-    @classmethod
-    def build_index(cls, file_path: str):
+    def build_index(job):
+        # All progress is written to the job, so concurrent uploads each
+        # keep their own status instead of sharing class-level globals
         start_time = time.time()
 
-        cls.status = "processing"
-        cls.progress = 0
-        cls.time_taken = 0
-        cls.cancel_event.clear()
-        cls.was_cancelled = False
+        job.status = "processing"
+        job.progress = 0
 
-        file_path = Path(file_path)
+        file_path = Path(job.file_path)
 
         if not file_path.exists():
-            cls.status = "error"
+            job.status = "error"
+            job.error = "File not found"
             return
 
-        text = cls.read_file(file_path)
+        job.units_total = count_units(file_path)
+
+        # Other writers (threads, workers, the build script) wait, so the
+        # base read here is still live when the snapshot is committed
+        with IndexStore.writing():
+            # Copy-on-write into a staging snapshot; published ones are immutable
+            staging = IndexStore.new_snapshot_dir()
+            vector_index = VectorIndex.open_for_update(IndexStore.current_path(), staging)
+
+            try:
+                # Parsing, chunking, embedding and insertion overlap in one pipeline
+                pipeline = IngestionPipeline(
+                    file_path, vector_index, job.cancel_event, text_splitter, job.file_id
+                )
+                job.pipeline = pipeline
+
+                try:
+                    pipeline.run()
+                except IngestionCancelled:
+                    job.status = "cancelled"
+                    job.progress = 0
+                    return
+                except Exception as e:
+                    print("Ingestion failed:", e)
+                    job.status = "error"
+                    job.error = str(e)
+                    return
+                finally:
+                    job.sync_progress()
+
+                if pipeline.chunks_total == 0:
+                    job.status = "error"
+                    job.error = "File is empty or unreadable"
+                    return
+
+                # Publish the staging snapshot with an atomic pointer swap, only
+                # if something was embedded or tagged with this document
+                if vector_index.changed:
+                    vector_index.save()
+                    job.snapshot = IndexStore.commit_snapshot(staging, publish=True)
+            finally:
+                # Anything not committed (cancel, error, nothing new) is dropped
+                vector_index.discard()
+                IndexStore.discard_staging(staging)
+
+        job.time_taken = round(time.time() - start_time, 2)
+        job.status = "ready"
+        job.progress = 100
 
-        if not text.strip():
-            cls.status = "error"
-            return
-
-        chunks = text_splitter.split_text(text)
-        total = len(chunks)
-
-        if total == 0:
-            cls.status = "error"
-            return
-
-        # Load existing index if available
-        if (FAISS_INDEX_PATH / "index.faiss").exists():
-            vector_store = FAISS.load_local(
-                str(FAISS_INDEX_PATH),
-                embeddings_model,
-                allow_dangerous_deserialization=True
-            )
-        else:
-            vector_store = None
-
-        batch_size = 8
-
-        for i in range(0, total, batch_size):
-
-            # 🔴 Cancel check BEFORE heavy operation
-            if cls.cancel_event.is_set():
-                cls.status = "cancelled"
-                cls.progress = 0
-                cls.was_cancelled = True
-                return
-
-            batch = chunks[i:i + batch_size]
-
-            # Heavy operation
-            if vector_store is None:
-                vector_store = FAISS.from_texts(batch, embeddings_model)
-            else:
-                vector_store.add_texts(batch)
-
-            processed = min(i + batch_size, total)
-            cls.progress = int((processed / total) * 100)
-
-        # If cancelled after loop (rare but safe)
-        if cls.cancel_event.is_set():
-            cls.status = "cancelled"
-            cls.progress = 0
-            cls.was_cancelled = True
-            return
-
-        # Save only if not cancelled
-        if vector_store and not cls.was_cancelled:
-            vector_store.save_local(str(FAISS_INDEX_PATH))
-
-        cls.time_taken = round(time.time() - start_time, 2)
-        cls.status = "ready"
-        cls.progress = 100
-
-
-    @classmethod
-    def cancel(cls):
-        print("Cancel called!")
-        cls.cancel_event.set()
+    @staticmethod
+    def remove_file(job):
+        # Deletes one document's vectors by id; nothing is re-embedded
+        start_time = time.time()
+        job.status = "processing"
+
+        with IndexStore.writing():
+            staging = IndexStore.new_snapshot_dir()
+            vector_index = VectorIndex.open_for_update(IndexStore.current_path(), staging)
+            try:
+                if vector_index.index is not None:
+                    job.chunks_total = vector_index.remove_file(job.file_id)
+                if vector_index.changed:
+                    vector_index.save()
+                    job.snapshot = IndexStore.commit_snapshot(staging, publish=True)
+            finally:
+                vector_index.discard()
+                IndexStore.discard_staging(staging)
+
+        job.time_taken = round(time.time() - start_time, 2)
+        job.status = "ready"
+        job.progress = 100
@@ -4,6 +4,7 @@ import { Send } from "lucide-react";
 interface Message {
   sender: "user" | "bot";
   text: string;
+  truncated?: boolean; // answer stopped before it was complete
 }
 
 interface Thread {
@@ -11,6 +12,25 @@ interface Thread {
   title: string;
 }
 
+interface StreamEvent {
+  id: string | null;
+  event: string;
+  data: string | null; // null for comment-only blocks (": ping")
+}
+
+// Parse one Server-Sent Event block ("id: ...\nevent: ...\ndata: ...")
+function parseEvent(block: string): StreamEvent {
+  let id = null;
+  let event = "message";
+  const data: string[] = [];
+  for (const line of block.split("\n")) {
+    if (line.startsWith("id:")) id = line.slice(3).trim();
+    else if (line.startsWith("event:")) event = line.slice(6).trim();
+    else if (line.startsWith("data:")) data.push(line.slice(5).replace(/^ /, ""));
+  }
+  return { id, event, data: data.length ? data.join("\n") : null };
+}
+
 export default function ChatPage() {
   const [messages, setMessages] = useState<Message[]>([]);
   const [threads, setThreads] = useState<Thread[]>([]);
@@ -106,26 +126,94 @@ export default function ChatPage() {
         body: JSON.stringify({ message: input, thread_id: threadId })
       });
 
-      const reader = res.body!.getReader();
-      const decoder = new TextDecoder();
-
-      let botText = ""; // Temporary buffer
-
-      while (true) {
-        const { value, done } = await reader.read();
-        if (done) break;
-
-        const chunk = decoder.decode(value);
-        botText += chunk;
+      const showBotText = (text: string) => {
+        setMessages((prev) => {
+          const updated = [...prev];
+          updated[botIndexRef.current] = {
+            ...updated[botIndexRef.current],
+            text
+          };
+          return updated;
+        });
+      };
+
+      // Too many answers being generated right now
+      if (res.status === 429) {
+        const retryAfter = res.headers.get("Retry-After");
+        showBotText(
+          `The assistant is busy right now. Please try again in ${retryAfter || "a few"} seconds.`
+        );
+        setTyping(false);
+        return;
+      }
 
+      const markTruncated = () => {
         setMessages((prev) => {
           const updated = [...prev];
           updated[botIndexRef.current] = {
             ...updated[botIndexRef.current],
-            text: botText
+            truncated: true
           };
           return updated;
         });
+      };
+
+      const streamId = res.headers.get("X-Stream-Id");
+      let lastEventId = "0";
+      let botText = ""; // Temporary buffer
+
+      const readEvents = async (body: ReadableStream<Uint8Array>) => {
+        const reader = body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = ""; // Incomplete event carried over to the next read
+
+        while (true) {
+          const { value, done } = await reader.read();
+          if (done) break;
+
+          buffer += decoder.decode(value, { stream: true });
+
+          // Events are separated by a blank line
+          let boundary;
+          while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+            const { id, event, data } = parseEvent(buffer.slice(0, boundary));
+            buffer = buffer.slice(boundary + 2);
+
+            if (id) lastEventId = id;
+            if (data === null || event === "meta") continue; // heartbeat / prompt stats
+
+            if (event === "queue") {
+              // Waiting for a free slot before generation starts
+              const { position } = JSON.parse(data);
+              showBotText(`Waiting in queue (position ${position})...`);
+            } else if (event === "done") {
+              // Last event; the answer may have been stopped part way
+              if (JSON.parse(data).truncated) markTruncated();
+            } else if (event === "error") {
+              const { status, retry_after } = JSON.parse(data);
+              showBotText(
+                status === 429
+                  ? `The assistant is busy right now. Please try again in ${retry_after || "a few"} seconds.`
+                  : "Something went wrong while answering. Please try again."
+              );
+            } else {
+              botText += data;
+              showBotText(botText);
+            }
+          }
+        }
+      };
+
+      try {
+        await readEvents(res.body!);
+      } catch (err) {
+        // Connection dropped mid-answer: pick up after the last event once
+        if (!streamId) throw err;
+        const resumed = await fetch(`${API_URL}/chat/resume/${streamId}`, {
+          headers: { "Last-Event-ID": lastEventId }
+        });
+        if (!resumed.ok) throw err;
+        await readEvents(resumed.body!);
       }
     } catch (err) {
       console.error(err);
@@ -212,6 +300,11 @@ export default function ChatPage() {
                 }`}
               >
                 {msg.text}
+                {msg.truncated && (
+                  <div className="mt-1 text-xs italic text-gray-500">
+                    Answer was cut short.
+                  </div>
+                )}
               </div>
             </div>
           ))}